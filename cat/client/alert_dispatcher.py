@@ -0,0 +1,320 @@
+import time
+import queue
+import random
+import logging
+import threading
+
+# Результаты отправки: доставлено, отклонено сервером (повтор не поможет), временная ошибка
+SENT = 'sent'
+REJECTED = 'rejected'
+FAILED = 'failed'
+
+
+class AlertDispatcher:
+    """
+    Фоновая отправка уведомлений на сервер.
+    Мониторинг только кладет уведомление в очередь и продолжает работу,
+    а отдельный поток отправляет его через постоянную HTTP-сессию с повторами.
+    Если сервер недоступен, уведомление уходит в AlertSpool на диске
+    и отправляется позже, в порядке поступления.
+    Ответ 4xx (кроме 408 и 429) означает, что сервер не примет уведомление
+    и при повторе: такое уведомление не повторяется, а в хранилище помечается
+    неотправляемым. То же происходит после max_spool_attempts неудачных попыток,
+    чтобы одно уведомление не задерживало все следующие.
+    """
+
+    def __init__(self, api_config, spool=None, max_queue=20, max_retries=5, base_delay=1.0,
+                 max_delay=60.0, connect_timeout=5, max_spool_attempts=20, metrics=None):
+        self.logger = logging.getLogger(__name__)
+        self.metrics = metrics
+        self.api_url = f"{api_config['server_url']}{api_config['endpoint']}"
+        # Таймаут чтения берем из api_config.json, соединения - короткий
+        self.timeout = (connect_timeout, api_config.get('timeout', 10))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        # Сессия переиспользует TCP/TLS соединение между уведомлениями.
+        # requests импортируется в потоке отправки - не задерживает запуск охраны
+        self.session = None
+
+        # Хранилище неотправленных уведомлений (может отсутствовать)
+        self.spool = spool
+        self.max_spool_attempts = max_spool_attempts
+        self._spool_closed = False
+        self._spool_failures = 0
+        self._next_spool_attempt = 0.0
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop_event = threading.Event()
+        self._in_flight = 0
+        self._thread = threading.Thread(target=self._worker, name="AlertDispatcher", daemon=True)
+
+        # Статистика
+        self.alerts_sent = 0
+        self.alerts_failed = 0
+        self.alerts_rejected = 0
+        self.alerts_spooled = 0
+        self.alerts_dead_lettered = 0
+        self.retries = 0
+
+        self._thread.start()
+
+    def _create_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @property
+    def queue_depth(self):
+        """Сколько уведомлений ожидает отправки (включая текущее и сохраненные на диске)"""
+        spooled = self.spool.count() if self.spool is not None and not self._spool_closed else 0
+        return self._queue.qsize() + self._in_flight + spooled
+
+    def submit(self, alert_data, files):
+        """
+        Ставит уведомление в очередь, не блокируя вызывающий поток
+        files - словарь {имя поля: (имя файла, bytes)}, изображения уходят прямо из памяти
+        Возвращает False если очередь переполнена и сохранить уведомление некуда
+        """
+        try:
+            self._queue.put_nowait((alert_data, files))
+        except queue.Full:
+            if self.spool is not None:
+                return self._spool_alert(alert_data, files)
+            self.alerts_rejected += 1
+            self.logger.error(f"❌ Очередь уведомлений переполнена ({self._queue.maxsize}), уведомление отброшено")
+            return False
+
+        self.logger.info(f"📥 Уведомление поставлено в очередь (в очереди: {self.queue_depth})")
+        return True
+
+    def _backoff_delay(self, attempt):
+        """Экспоненциальная задержка с полным джиттером"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _read_files(self, files):
+        """Читает файлы уведомления в память: {имя поля: (имя файла, bytes)}"""
+        loaded = {}
+        for name, file in files.items():
+            if isinstance(file, tuple):
+                loaded[name] = file
+            elif file and file.exists():
+                loaded[name] = (file.name, file.read_bytes())
+        return loaded
+
+    def _spool_alert(self, alert_data, files):
+        """Сохраняет уведомление в хранилище на диске"""
+        try:
+            self.spool.push(alert_data, self._read_files(files))
+            self.alerts_spooled += 1
+            return True
+        except Exception as e:
+            self.alerts_rejected += 1
+            self.logger.error(f"❌ Не удалось сохранить уведомление в хранилище: {e}")
+            return False
+
+    @staticmethod
+    def _is_permanent(status_code):
+        """Ошибка клиента: повтор того же запроса получит тот же ответ"""
+        return 400 <= status_code < 500 and status_code not in (408, 429)
+
+    def _post(self, alert_data, files):
+        """
+        Один HTTP-запрос. Возвращает SENT при ответе 200, REJECTED при постоянной ошибке (4xx),
+        FAILED при остальных ответах; ошибки соединения - исключения requests
+        files - словарь {имя поля: Path или (имя файла, bytes)}
+        """
+        opened = {}
+        try:
+            for name, file in files.items():
+                if isinstance(file, tuple):
+                    opened[name] = file
+                elif file and file.exists():
+                    opened[name] = open(file, 'rb')
+
+            start = time.perf_counter()
+            response = self.session.post(
+                self.api_url,
+                data=alert_data,
+                files=opened,
+                timeout=self.timeout
+            )
+            if self.metrics is not None:
+                self.metrics.observe('alert_send', time.perf_counter() - start)
+        finally:
+            for file in opened.values():
+                if not isinstance(file, tuple):
+                    file.close()
+
+        if response.status_code == 200:
+            return SENT
+
+        self.logger.error(f"❌ Ошибка отправки: {response.status_code} - {response.text[:200]}")
+        return REJECTED if self._is_permanent(response.status_code) else FAILED
+
+    def _deliver(self, alert_data, files):
+        """
+        Отправляет уведомление с повторами (отклоненное сервером не повторяется)
+        Возвращает SENT, REJECTED или FAILED
+        """
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                delay = self._backoff_delay(attempt)
+                self.retries += 1
+                self.logger.info(f"🔁 Повтор отправки через {delay:.1f} сек (попытка {attempt + 1}/{self.max_retries + 1})")
+                if self._stop_event.wait(delay):
+                    return FAILED
+
+            try:
+                self.logger.info(f"📤 Отправка API запроса на: {self.api_url}")
+                result = self._post(alert_data, files)
+                if result != FAILED:
+                    return result
+            except Exception as e:
+                self.logger.error(f"❌ Ошибка отправки API запроса: {e}")
+
+        return FAILED
+
+    def _drain_spool(self):
+        """
+        Отправляет сохраненные уведомления, начиная с самого старого.
+        При первой временной ошибке откладывает следующую попытку с экспоненциальной задержкой.
+        Отклоненное сервером или исчерпавшее попытки уведомление помечается неотправляемым
+        """
+        while not self._stop_event.is_set():
+            item = self.spool.peek()
+            if item is None:
+                self._spool_failures = 0
+                return
+
+            alert_id, alert_data, files = item
+            self._in_flight = 1
+            try:
+                result = self._post(alert_data, files)
+            except Exception as e:
+                self.logger.error(f"❌ Ошибка отправки сохраненного уведомления: {e}")
+                result = FAILED
+            finally:
+                self._in_flight = 0
+
+            if result == REJECTED:
+                self._dead_letter(alert_id, "отклонено сервером")
+                continue
+
+            if result == FAILED:
+                attempts = self.spool.mark_attempt(alert_id)
+                if attempts >= self.max_spool_attempts:
+                    self._dead_letter(alert_id, f"не отправлено за {attempts} попыток")
+                    continue
+                self._spool_failures += 1
+                delay = self.base_delay + self._backoff_delay(self._spool_failures)
+                self._next_spool_attempt = time.time() + delay
+                self.logger.info(f"⏳ Сервер недоступен, повтор отправки хранилища через {delay:.1f} сек")
+                return
+
+            self.spool.remove(alert_id)
+            self._spool_failures = 0
+            self.alerts_sent += 1
+            self.logger.info(f"✅ Сохраненное уведомление #{alert_id} отправлено на сервер")
+
+    def _dead_letter(self, alert_id, reason):
+        """Помечает сохраненное уведомление неотправляемым - следующие уходят без задержки"""
+        self.spool.mark_failed(alert_id)
+        self.alerts_dead_lettered += 1
+        self.logger.error(f"❌ Сохраненное уведомление #{alert_id} {reason}, оставлено в хранилище для разбора")
+
+    def _worker(self):
+        """Поток отправки уведомлений"""
+        try:
+            self.session = self._create_session()
+        except Exception as e:
+            self.logger.error(f"❌ Не удалось создать HTTP-сессию: {e}")
+            return
+
+        while not self._stop_event.is_set():
+            spool_pending = self.spool is not None and self.spool.count() > 0
+
+            # Ждем новое уведомление, но не дольше момента следующей попытки отправки хранилища
+            wait = 0.5
+            if spool_pending:
+                wait = min(wait, max(0.0, self._next_spool_attempt - time.time()))
+
+            try:
+                alert_data, files = self._queue.get(timeout=wait) if wait > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                alert_data = None
+
+            if alert_data is not None:
+                try:
+                    if spool_pending:
+                        # Пока хранилище не пусто, новые уведомления встают за ним в очередь
+                        self._spool_alert(alert_data, files)
+                    else:
+                        self._in_flight = 1
+                        result = self._deliver(alert_data, files)
+                        if result == SENT:
+                            self.alerts_sent += 1
+                            self.logger.info("✅ Уведомление успешно отправлено на сервер")
+                        elif result == REJECTED:
+                            self.alerts_failed += 1
+                            self.logger.error("❌ Сервер отклонил уведомление, повтор не выполняется")
+                        elif self.spool is not None:
+                            # В том числе при остановке посреди повторов: хранилище закрывается
+                            # только после выхода этого потока
+                            self.logger.warning("⚠️ Сервер недоступен, уведомление сохранено для повторной отправки")
+                            self._next_spool_attempt = time.time() + self.max_delay
+                            self._spool_alert(alert_data, files)
+                        else:
+                            self.alerts_failed += 1
+                            self.logger.error("❌ Не удалось отправить уведомление после всех попыток")
+                finally:
+                    self._in_flight = 0
+                    self._queue.task_done()
+
+            if spool_pending and time.time() >= self._next_spool_attempt:
+                self._drain_spool()
+
+    def get_stats(self):
+        """Статистика отправки"""
+        return {
+            'queue_depth': self.queue_depth,
+            'sent': self.alerts_sent,
+            'failed': self.alerts_failed,
+            'rejected': self.alerts_rejected,
+            'spooled': self.alerts_spooled,
+            'dead_lettered': self.alerts_dead_lettered,
+            'spool_failed': self.spool.failed_count() if self.spool is not None and not self._spool_closed else 0,
+            'retries': self.retries
+        }
+
+    def stop(self, timeout=5.0):
+        """
+        Останавливает поток отправки.
+        Сессия и хранилище закрываются только после выхода потока: если он еще ждет
+        ответа сервера дольше timeout, они остаются открытыми до завершения процесса
+        """
+        self._stop_event.set()
+        self._thread.join(timeout=timeout)
+        stopped = not self._thread.is_alive()
+        if not stopped:
+            self.logger.warning("⚠️ Поток отправки уведомлений не завершился, хранилище не закрыто")
+        elif self.session is not None:
+            self.session.close()
+
+        # Уведомления, которые не успели уйти, сохраняем до следующего запуска
+        if self.spool is not None:
+            while True:
+                try:
+                    alert_data, files = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._spool_alert(alert_data, files)
+            if stopped:
+                self._spool_closed = True
+                self.spool.close()
@@ -0,0 +1,144 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+
+class AlertSpool:
+    """
+    Надежное хранилище неотправленных уведомлений на диске (SQLite).
+    Уведомления хранятся вместе с изображениями и отдаются в порядке поступления.
+    Уведомления, которые сервер отклонил или которые не ушли за все попытки,
+    помечаются как неотправляемые (failed_at) и остаются в базе для разбора,
+    не задерживая следующие. При превышении лимитов вытесняются самые старые записи,
+    начиная с неотправляемых.
+    """
+
+    def __init__(self, db_path="alert_spool.db", max_alerts=100, max_bytes=50 * 1024 * 1024):
+        self.logger = logging.getLogger(__name__)
+        self.db_path = Path(db_path)
+        self.max_alerts = max_alerts
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                alert_data TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                failed_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS alert_files (
+                alert_id INTEGER NOT NULL REFERENCES alerts(id) ON DELETE CASCADE,
+                name TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                data BLOB NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+        pending = self.count()
+        if pending:
+            self.logger.info(f"📦 В хранилище {pending} неотправленных уведомлений")
+
+    def push(self, alert_data, files):
+        """
+        Сохраняет уведомление
+        files - словарь {имя поля: (имя файла, bytes)}
+        """
+        size = sum(len(data) for _, data in files.values())
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO alerts (created_at, alert_data, size) VALUES (?, ?, ?)",
+                (time.time(), json.dumps(alert_data, ensure_ascii=False), size)
+            )
+            alert_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO alert_files (alert_id, name, filename, data) VALUES (?, ?, ?, ?)",
+                [(alert_id, name, filename, sqlite3.Binary(data)) for name, (filename, data) in files.items()]
+            )
+            evicted = self._evict()
+            self._conn.commit()
+
+        if evicted:
+            self.logger.warning(f"🗑️ Хранилище уведомлений переполнено, удалено старых: {evicted}")
+        self.logger.info(f"💾 Уведомление сохранено в хранилище (#{alert_id})")
+        return alert_id
+
+    def _evict(self):
+        """Удаляет самые старые уведомления сверх лимитов (вызывается под блокировкой)"""
+        evicted = 0
+        while True:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM alerts").fetchone()
+            # Последнее уведомление не вытесняем, даже если оно одно больше лимита
+            if count <= 1 or (count <= self.max_alerts and total <= self.max_bytes):
+                return evicted
+            self._conn.execute(
+                "DELETE FROM alerts WHERE id = (SELECT id FROM alerts ORDER BY failed_at IS NULL, id LIMIT 1)"
+            )
+            evicted += 1
+
+    def peek(self):
+        """
+        Возвращает самое старое уведомление, ожидающее отправки: (id, alert_data, files)
+        или None если таких нет
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, alert_data FROM alerts WHERE failed_at IS NULL ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+
+            alert_id, alert_data = row
+            files = {
+                name: (filename, bytes(data))
+                for name, filename, data in self._conn.execute(
+                    "SELECT name, filename, data FROM alert_files WHERE alert_id = ?", (alert_id,)
+                )
+            }
+
+        return alert_id, json.loads(alert_data), files
+
+    def remove(self, alert_id):
+        """Удаляет уведомление после успешной отправки"""
+        with self._lock:
+            self._conn.execute("DELETE FROM alerts WHERE id = ?", (alert_id,))
+            self._conn.commit()
+
+    def mark_attempt(self, alert_id):
+        """Увеличивает счетчик попыток отправки. Возвращает число попыток"""
+        with self._lock:
+            self._conn.execute("UPDATE alerts SET attempts = attempts + 1 WHERE id = ?", (alert_id,))
+            self._conn.commit()
+            row = self._conn.execute("SELECT attempts FROM alerts WHERE id = ?", (alert_id,)).fetchone()
+        return row[0] if row else 0
+
+    def mark_failed(self, alert_id):
+        """Помечает уведомление как неотправляемое: оно остается в базе, но больше не отдается peek"""
+        with self._lock:
+            self._conn.execute("UPDATE alerts SET failed_at = ? WHERE id = ?", (time.time(), alert_id))
+            self._conn.commit()
+
+    def count(self):
+        """Количество уведомлений, ожидающих отправки"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM alerts WHERE failed_at IS NULL").fetchone()[0]
+
+    def failed_count(self):
+        """Количество неотправляемых уведомлений"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM alerts WHERE failed_at IS NOT NULL").fetchone()[0]
+
+    def close(self):
+        """Закрывает базу"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,128 @@
+import time
+import logging
+import threading
+
+from .frame_grabber import FrameGrabber
+from .motion_detector import MotionDetector
+from .frame_scheduler import FrameScheduler
+from .face_tracker import FaceTracker
+from .evidence_buffer import EvidenceBuffer
+from .rate_engine import DetectionRateEngine
+from .shared_frames import SharedFrameRing
+
+
+class CameraChannel:
+    """
+    Один источник кадров (веб-камера, видеофайл или поток) со всем своим состоянием:
+    поток захвата, фильтр движения, планировщик, трекер лиц, счетчики обнаружений
+    и буфер доказательств. Детектор и распознавание общие для всех каналов.
+    clock - источник времени для счетчиков, фильтра движения, трекера, буфера и планировщика
+    """
+
+    def __init__(self, name, source, config=None, metrics=None, alert_time_window=60, alert_threshold=20,
+                 frame_ring_slots=0, clock=time.time):
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        self.source = source
+
+        if config:
+            self.motion_gate_enabled = config.get_bool('motion_gate_enabled', True)
+            motion_threshold = config.get_float('motion_threshold', 0.01)
+            motion_keepalive_interval = config.get_float('motion_keepalive_interval', 10.0)
+            tracker_iou_threshold = config.get_float('tracker_iou_threshold', 0.3)
+            evidence_buffer_size = config.get_int('evidence_buffer_size', 15)
+        else:
+            self.motion_gate_enabled = True
+            motion_threshold = 0.01
+            motion_keepalive_interval = 10.0
+            tracker_iou_threshold = 0.3
+            evidence_buffer_size = 15
+
+        # Для пула процессов кадры пишутся в кольцо в общей памяти и не копируются в воркеры.
+        # Кольцо создается в open(): каналу без захвата (replay) общая память не нужна
+        self.frame_ring_slots = frame_ring_slots
+        self.frame_ring = None
+
+        # Камера читается в отдельном потоке, обработка берет последний кадр
+        self.frame_grabber = FrameGrabber(source=source, width=640, height=480, metrics=metrics)
+        self.motion_detector = MotionDetector(
+            area_threshold=motion_threshold,
+            keepalive_interval=motion_keepalive_interval,
+            clock=clock
+        )
+        self.frame_scheduler = FrameScheduler.from_config(config, clock=clock)
+        self.face_tracker = FaceTracker(iou_threshold=tracker_iou_threshold, clock=clock)
+
+        # Счетчики обнаружений за временные окна, гистерезис и cooldown уведомлений
+        self.rate_engine = DetectionRateEngine.from_config(
+            config,
+            alert_time_window=alert_time_window,
+            alert_threshold=alert_threshold,
+            clock=clock
+        )
+
+        # Буфер последних кадров с незнакомцем - в уведомление идут самые четкие
+        self.evidence_buffer = EvidenceBuffer(max_frames=evidence_buffer_size, clock=clock)
+
+        # Были ли лица на последнем проверенном кадре
+        self.faces_present = False
+        self.last_detection_time = None
+
+        # Сколько раз распознавание реально запускалось и сколько раз взято из кэша трека
+        self.recognitions_run = 0
+        self.recognitions_cached = 0
+
+        # Запрос на перепроверку всех треков (например после смены модели);
+        # выполняется потоком обработки канала, а не тем, кто его запросил
+        self.reverify_requested = threading.Event()
+
+        # Поток обработки канала (создается в ComputerGuard.start_monitoring)
+        self.thread = None
+
+    @property
+    def detection_counter(self):
+        """Количество обнаружений в основном окне"""
+        return self.rate_engine.count
+
+    @property
+    def alert_sent(self):
+        """Флаг отправки уведомления: True пока движок частоты не взведен снова"""
+        return not self.rate_engine.armed
+
+    @alert_sent.setter
+    def alert_sent(self, value):
+        if value:
+            self.rate_engine.disarm()
+        else:
+            self.rate_engine.rearm()
+
+    def open(self):
+        """Создает кольцо кадров (если нужно) и запускает захват. Возвращает True при успехе"""
+        if self.frame_ring_slots and self.frame_ring is None:
+            self.frame_ring = SharedFrameRing(slots=self.frame_ring_slots, shape=(480, 640, 3))
+            self.frame_grabber.frame_ring = self.frame_ring
+        return self.frame_grabber.start()
+
+    def request_reverify(self):
+        """Просит поток обработки перепроверить все треки перед следующим кадром (из любого потока)"""
+        self.reverify_requested.set()
+
+    def get_stats(self):
+        """Статистика канала для логов и метрик"""
+        stats = {f"camera_frames_{key}": value for key, value in self.frame_grabber.get_stats().items()}
+        stats.update({f"motion_frames_{key}": value for key, value in self.motion_detector.get_stats().items()})
+        stats.update({
+            'recognitions_run': self.recognitions_run,
+            'recognitions_cached': self.recognitions_cached,
+            'detection_counter': self.detection_counter,
+        })
+        if self.frame_ring is not None:
+            stats.update({f"frame_ring_{key}": value for key, value in self.frame_ring.get_stats().items()})
+        return stats
+
+    def close(self):
+        """Останавливает захват и фоновые потоки канала"""
+        self.frame_grabber.stop()
+        self.evidence_buffer.close()
+        if self.frame_ring is not None:
+            self.frame_ring.close()
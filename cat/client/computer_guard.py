@@ -1,51 +1,191 @@
+import os
 import cv2
 import time
 import json
+import threading
+from functools import partial
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 import logging
-import requests
-import pyautogui
+from concurrent.futures import ThreadPoolExecutor
 
 from .face_detector import FaceDetector
 from .face_recognizer import FaceRecognizer
+from .alert_dispatcher import AlertDispatcher
+from .alert_spool import AlertSpool
+from .screen_capture import ScreenCapture
+from .metrics import PipelineMetrics
+from .camera_channel import CameraChannel
+from .inference_pool import InferencePool
+from .process_inference import ProcessInferencePool
+from .startup_profiler import StartupProfiler
+from .model_watcher import ModelWatcher
 
 class ComputerGuard:
     """Главный класс системы охраны"""
     
-    def __init__(self, computer_id: str = None, config=None):
+    def __init__(self, computer_id: str = None, config=None, startup=None, clock=None):
         self.logger = logging.getLogger(__name__)
         self.config = config
+        # Источник времени конвейера, общий для компонентов всех каналов. По умолчанию time.time;
+        # replay подставляет время записи (номер кадра / fps), чтобы окна счетчиков,
+        # keep-alive и перепроверка треков не зависели от скорости машины
+        self.clock = clock or time.time
+        # Замер этапов запуска до первого проанализированного кадра
+        self.startup = startup or StartupProfiler()
         
         # Загружаем настройки из конфига или используем по умолчанию
         if config:
             self.detection_threshold = config.get_int('detection_threshold', 30)
             self.alert_threshold = config.get_int('alert_threshold', 20)
             self.alert_time_window = config.get_int('alert_time_window', 60)
+            self.recognition_reverify_interval = config.get_float('recognition_reverify_interval', 5.0)
+            self.stranger_reverify_interval = config.get_float('stranger_reverify_interval', 0.5)
+            self.detection_scale = config.get_float('detection_scale', 1.0)
+            self.detector_backend = config.get('detector_backend', 'mediapipe_short')
+            self.detector_confidence = config.get_float('detector_confidence', 0.5)
+            self.yunet_model_path = config.get('yunet_model_path', 'models/face_detection_yunet_2023mar.onnx')
+            self.recognizer_backend = config.get('recognizer_backend', 'lbph')
+            self.recognizer_distance_threshold = config.get_float('recognizer_distance_threshold', 0.6)
+            self.ann_index_enabled = config.get_bool('ann_index_enabled', False)
+            self.ann_nprobe = config.get_int('ann_nprobe', 8)
+            self.inference_workers = config.get_int('inference_workers', 0)
+            self.inference_mode = config.get('inference_mode', 'thread')
+            self.shared_frames_enabled = config.get_bool('shared_frames_enabled', True)
+            self.model_reload_enabled = config.get_bool('model_reload_enabled', True)
+            self.model_reload_interval = config.get_float('model_reload_interval', 2.0)
+            self.model_reload_debounce = config.get_float('model_reload_debounce', 1.0)
         else:
             self.detection_threshold = 30
             self.alert_threshold = 20
             self.alert_time_window = 60
+            self.recognition_reverify_interval = 5.0
+            self.stranger_reverify_interval = 0.5
+            self.detection_scale = 1.0
+            self.detector_backend = 'mediapipe_short'
+            self.detector_confidence = 0.5
+            self.yunet_model_path = 'models/face_detection_yunet_2023mar.onnx'
+            self.recognizer_backend = 'lbph'
+            self.recognizer_distance_threshold = 0.6
+            self.ann_index_enabled = False
+            self.ann_nprobe = 8
+            self.inference_workers = 0
+            self.inference_mode = 'thread'
+            self.shared_frames_enabled = True
+            self.model_reload_enabled = True
+            self.model_reload_interval = 2.0
+            self.model_reload_debounce = 1.0
         
         self.computer_id = computer_id or self._get_or_create_computer_id()
-        self.last_detection_time = None
         self.is_running = False
         
-        # Счетчик обнаружений за временное окно
-        self.detection_counter = 0
-        self.detection_timestamps = []
-        
-        # Флаг отправки уведомления
-        self.alert_sent = False
-        
         # Конфигурация API
         self.api_config = self._load_api_config()
         
-        # Инициализация компонентов
-        self.face_detector = FaceDetector()
-        self.face_recognizer = FaceRecognizer()
+        # Метрики конвейера (задержки этапов, fps, счетчики) в формате Prometheus
+        self.metrics = PipelineMetrics(
+            metrics_file=config.get('metrics_file', 'metrics.prom') if config else 'metrics.prom',
+            interval=config.get_float('metrics_interval', 15.0) if config else 15.0,
+            enabled=config.get_bool('metrics_enabled', True) if config else True
+        )
+        
+        with self.startup.phase('alert_dispatcher'):
+            self.alert_dispatcher = AlertDispatcher(
+                self.api_config,
+                spool=self._create_alert_spool(),
+                max_retries=self.api_config.get('max_retries', 5),
+                max_spool_attempts=config.get_int('alert_spool_max_attempts', 20) if config else 20,
+                metrics=self.metrics
+            )
+        
+        process_workers = 0
+        if self.inference_mode == 'process':
+            process_workers = self.inference_workers or max(1, (os.cpu_count() or 2) - 1)
+        
+        # Слоты кольца кадров: кадры в конвейере (по одному на процесс),
+        # непрочитанный и записываемый кадры захвата и один запасной
+        frame_ring_slots = process_workers + 3 if process_workers and self.shared_frames_enabled else 0
+        
+        # Источники кадров: у каждого свой поток захвата, трекер и счетчики
+        self.channels = [
+            CameraChannel(
+                f"cam{index}", source,
+                config=config,
+                metrics=self.metrics,
+                alert_time_window=self.alert_time_window,
+                alert_threshold=self.alert_threshold,
+                frame_ring_slots=frame_ring_slots,
+                clock=self.clock
+            )
+            for index, source in enumerate(self._parse_camera_sources())
+        ]
+        
+        # Модель распознавания загружается один раз и общая для всех камер,
+        # детекция и распознавание выполняются в общем пуле потоков
+        recognizer_options = {
+            'db_path': "known_faces_db",
+            'backend': self.recognizer_backend,
+            'distance_threshold': self.recognizer_distance_threshold,
+            'ann_index': self.ann_index_enabled,
+            'ann_nprobe': self.ann_nprobe
+        }
+        # Новая модель после переобучения подхватывается без перезапуска.
+        # Состояние файлов запоминается до загрузки: переобучение, закончившееся
+        # во время открытия камер, будет замечено при запуске наблюдения
+        self.model_watcher = None
+        if self.model_reload_enabled:
+            self.model_watcher = ModelWatcher(
+                recognizer_options['db_path'],
+                self._reload_model,
+                interval=self.model_reload_interval,
+                debounce=self.model_reload_debounce
+            )
+            self.model_watcher.mark_loaded()
+        with self.startup.phase('recognizer_load'):
+            self.face_recognizer = FaceRecognizer(metrics=self.metrics, **recognizer_options)
+        detector_options = {
+            'detection_scale': self.detection_scale,
+            'backend': self.detector_backend,
+            'min_confidence': self.detector_confidence,
+            'model_path': self.yunet_model_path
+        }
+        # Пулы загружают модели в фоне - параллельно с открытием камер в start_monitoring
+        self._inference_started = time.perf_counter()
+        self.process_pool = None
+        if self.inference_mode == 'process':
+            # Отдельные процессы со своими моделями - параллельно на всех ядрах, без GIL
+            self.process_pool = ProcessInferencePool(
+                workers=process_workers,
+                detector_options=detector_options,
+                recognizer_options=recognizer_options,
+                metrics=self.metrics
+            )
+        else:
+            workers = self.inference_workers or min(os.cpu_count() or 1, len(self.channels))
+            self.inference_pool = InferencePool(
+                lambda: FaceDetector(metrics=self.metrics, **detector_options),
+                workers=workers,
+                metrics=self.metrics
+            )
+        
+        # Хранить ли копии фото и скриншотов на диске (для отправки они не нужны)
+        self.evidence_retention = config.get_bool('evidence_retention', False) if config else False
+        
+        # Сколько самых четких кадров из буфера канала отправлять в уведомлении
+        self.evidence_photos = config.get_int('evidence_photos', 3) if config else 3
+        
+        # Сбор доказательств для уведомления не блокирует обработку кадров
+        self.screen_capture = ScreenCapture(
+            max_width=config.get_int('screenshot_max_width', 1280) if config else 1280,
+            image_format=config.get('screenshot_format', 'jpeg') if config else 'jpeg',
+            quality=config.get_int('screenshot_quality', 80) if config else 80
+        )
+        self._alert_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="AlertEvidence")
+        self._screenshot_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Screenshot")
         
         self.logger.info(f"🖥️ Идентификатор компьютера: {self.computer_id}")
+        self.logger.info(f"🎥 Источники кадров: {', '.join(f'{c.name}={c.source}' for c in self.channels)}")
         self.logger.info(f"📊 Настройки: threshold={self.alert_threshold}, window={self.alert_time_window}s")
         self.logger.info("🚀 Система охраны инициализирована")
     
@@ -55,7 +195,8 @@ class ComputerGuard:
         default_config = {
             "server_url": "http://localhost:8000",
             "endpoint": "/api/alert",
-            "timeout": 10
+            "timeout": 10,
+            "max_retries": 5
         }
         
         if config_path.exists():
@@ -72,6 +213,48 @@ class ComputerGuard:
         
         return default_config
     
+    def _parse_camera_sources(self):
+        """
+        Список источников кадров из config.txt.
+        camera_sources - через запятую: номер веб-камеры, путь к видео или URL потока.
+        Если не задан - используется camera_index
+        """
+        value = self.config.get('camera_sources', '') if self.config else ''
+        if not value.strip():
+            value = self.config.get('camera_index', '0') if self.config else '0'
+        
+        sources = []
+        for item in value.split(','):
+            item = item.strip()
+            if item:
+                sources.append(int(item) if item.isdigit() else item)
+        return sources or [0]
+    
+    def _register_metric_collectors(self):
+        """Подключает к метрикам статистику компонентов (опрашивается только при выгрузке)"""
+        for channel in self.channels:
+            self.metrics.add_collector(channel.get_stats, labels={'camera': channel.name})
+        self.metrics.add_collector(lambda: {'alert_queue_depth': self.alert_dispatcher.queue_depth})
+        self.metrics.add_collector(self.startup.as_metrics)
+        if self.model_watcher is not None:
+            self.metrics.add_collector(
+                lambda: {f"model_{key}": value for key, value in self.model_watcher.get_stats().items()}
+            )
+    
+    def _create_alert_spool(self):
+        """Создает хранилище неотправленных уведомлений (если включено в config.txt)"""
+        if self.config and not self.config.get_bool('alert_spool_enabled', True):
+            return None
+        
+        max_alerts = self.config.get_int('alert_spool_max_alerts', 100) if self.config else 100
+        max_mb = self.config.get_int('alert_spool_max_mb', 50) if self.config else 50
+        
+        try:
+            return AlertSpool(max_alerts=max_alerts, max_bytes=max_mb * 1024 * 1024)
+        except Exception as e:
+            self.logger.error(f"❌ Не удалось открыть хранилище уведомлений: {e}")
+            return None
+    
     def _get_or_create_computer_id(self) -> str:
         """Получение или создание ID компьютера"""
         config_path = Path("computer_config.json")
@@ -102,162 +285,411 @@ class ComputerGuard:
         
         return computer_id
     
-    def _update_detection_counter(self):
-        """Обновляет счетчик обнаружений за временное окно"""
-        current_time = time.time()
-        
-        # Удаляем старые обнаружения (старше alert_time_window)
-        self.detection_timestamps = [
-            ts for ts in self.detection_timestamps 
-            if current_time - ts <= self.alert_time_window
-        ]
-        
-        # Добавляем текущее обнаружение
-        self.detection_timestamps.append(current_time)
-        self.detection_counter = len(self.detection_timestamps)
-        
-        self.logger.debug(f"📊 Счетчик обнаружений: {self.detection_counter}/{self.alert_threshold}")
+    def _retain_evidence(self, directory: str, filename: str, data: bytes):
+        """Сохраняет копию доказательства на диск (только если включено хранение)"""
+        if not self.evidence_retention:
+            return
         
-        # СБРАСЫВАЕМ ФЛАГ если счетчик упал ниже порога
-        if self.detection_counter < self.alert_threshold:
-            self.alert_sent = False
-            self.logger.debug("🔄 Флаг уведомления сброшен (счетчик ниже порога)")
+        try:
+            evidence_dir = Path(directory)
+            evidence_dir.mkdir(exist_ok=True)
+            (evidence_dir / filename).write_bytes(data)
+            self.logger.info(f"💾 Сохранена копия: {evidence_dir / filename}")
+        except Exception as e:
+            self.logger.error(f"Ошибка сохранения копии {filename}: {e}")
     
-    def capture_stranger_photo(self, frame) -> Path:
-        """Сохранение фото незнакомца с камеры"""
+    def capture_stranger_photo(self, frame) -> tuple:
+        """
+        Сжатие фото незнакомца с камеры в JPEG в памяти
+        Возвращает (имя файла, bytes) или None
+        """
         try:
-            strangers_dir = Path("strangers_photos")
-            strangers_dir.mkdir(exist_ok=True)
-            
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = strangers_dir / f"stranger_{self.computer_id}_{timestamp}.jpg"
+            filename = f"stranger_{self.computer_id}_{timestamp}.jpg"
+            
+            ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+            if not ok:
+                raise RuntimeError("cv2.imencode вернул ошибку")
+            data = buffer.tobytes()
             
-            cv2.imwrite(str(filename), frame)
-            self.logger.info(f"📸 Сохранено фото незнакомца: {filename}")
-            return filename
+            self.logger.info(f"📸 Фото незнакомца: {filename} ({len(data) / 1024:.0f} KB)")
+            self._retain_evidence("strangers_photos", filename, data)
+            return filename, data
             
         except Exception as e:
-            self.logger.error(f"Ошибка сохранения фото незнакомца: {e}")
+            self.logger.error(f"Ошибка сжатия фото незнакомца: {e}")
             return None
     
-    def take_screenshot(self) -> Path:
-        """Создание скриншота экрана"""
+    def take_screenshot(self) -> tuple:
+        """
+        Создание уменьшенного и сжатого скриншота экрана в памяти
+        Возвращает (имя файла, bytes) или None
+        """
         try:
-            screenshot_dir = Path("screenshots")
-            screenshot_dir.mkdir(exist_ok=True)
-            
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = screenshot_dir / f"screenshot_{self.computer_id}_{timestamp}.png"
+            filename = f"screenshot_{self.computer_id}_{timestamp}{self.screen_capture.extension}"
             
-            screenshot = pyautogui.screenshot()
-            screenshot.save(filename)
+            with self.metrics.time_stage('screenshot'):
+                data = self.screen_capture.capture()
             
-            self.logger.info(f"🖥️ Сохранен скриншот: {filename}")
-            return filename
+            timings = self.screen_capture.last_timings
+            self.logger.info(
+                f"🖥️ Скриншот: {filename} ({timings['size_kb']:.0f} KB, "
+                f"снимок {timings['grab_ms']:.0f} мс, масштаб {timings['resize_ms']:.0f} мс, "
+                f"сжатие {timings['encode_ms']:.0f} мс)"
+            )
+            self._retain_evidence("screenshots", filename, data)
+            return filename, data
             
         except Exception as e:
             self.logger.error(f"Ошибка создания скриншота: {e}")
             return None
     
-    def send_api_alert(self, stranger_photo: Path, screenshot: Path):
-        """Отправка уведомления на сервер через API"""
+    def _best_stranger_photos(self, channel):
+        """
+        Забирает лучшие кадры с незнакомцем из буфера доказательств канала
+        Возвращает список (имя файла, bytes), лучший первым
+        """
+        best = channel.evidence_buffer.best(self.evidence_photos)
+        channel.evidence_buffer.clear()
+        
+        photos = []
+        for index, (score, timestamp, data) in enumerate(best, start=1):
+            stamp = datetime.fromtimestamp(timestamp).strftime("%Y%m%d_%H%M%S")
+            filename = f"stranger_{self.computer_id}_{channel.name}_{stamp}_{index}.jpg"
+            self.logger.info(f"📸 Фото незнакомца #{index}: {filename} (оценка {score:.0f}, {len(data) / 1024:.0f} KB)")
+            self._retain_evidence("strangers_photos", filename, data)
+            photos.append((filename, data))
+        
+        return photos
+    
+    def _collect_and_send_alert(self, channel, frame, detection_count, window_seconds=None):
+        """
+        Собирает доказательства и ставит уведомление в очередь (в фоновом потоке).
+        Скриншот делается параллельно с сохранением фото незнакомца
+        """
         try:
-            # Подготавливаем данные для отправки
-            alert_data = {
-                "computer_id": self.computer_id,
-                "command": "stranger_alert",
-                "timestamp": datetime.now().isoformat(),
-                "detection_count": self.detection_counter,
-                "message": f"Обнаружено незнакомое лицо {self.detection_counter} раз за последнюю минуту"
-            }
-            
-            # Подготавливаем файлы для отправки
-            files = {}
+            screenshot_future = self._screenshot_executor.submit(self.take_screenshot)
             
-            if stranger_photo and stranger_photo.exists():
-                files['stranger_photo'] = open(stranger_photo, 'rb')
+            # Лучшие кадры из буфера; если буфер пуст - текущий кадр
+            with self.metrics.time_stage('evidence'):
+                photos = self._best_stranger_photos(channel)
+                if not photos:
+                    stranger_photo = self.capture_stranger_photo(frame)
+                    photos = [stranger_photo] if stranger_photo else []
             
-            if screenshot and screenshot.exists():
-                files['screenshot'] = open(str(screenshot), 'rb')
+            # Дожидаемся скриншота
+            screenshot = screenshot_future.result()
             
-            # URL для отправки
-            api_url = f"{self.api_config['server_url']}{self.api_config['endpoint']}"
-            
-            self.logger.info(f"📤 Отправка API запроса на: {api_url}")
-            
-            # Отправляем POST запрос
-            response = requests.post(
-                api_url,
-                data=alert_data,
-                files=files,
-                timeout=self.api_config['timeout']
-            )
-            
-            # Закрываем файлы
-            for file in files.values():
-                file.close()
+            # Ставим уведомление в очередь на отправку (не ждем сеть)
+            stranger_photo = photos[0] if photos else None
+            with self.metrics.time_stage('alert_submit'):
+                submitted = self.send_api_alert(stranger_photo, screenshot, detection_count,
+                                                extra_photos=photos[1:], camera=channel.name,
+                                                window_seconds=window_seconds)
+            if submitted:
+                self.logger.info("✅ Уведомление поставлено в очередь.")
+                return
             
-            if response.status_code == 200:
-                self.logger.info("✅ Уведомление успешно отправлено на сервер")
-                return True
-            else:
-                self.logger.error(f"❌ Ошибка отправки: {response.status_code} - {response.text}")
-                return False
-                
+            self.logger.error("❌ Не удалось поставить уведомление в очередь. Флаг сброшен.")
         except Exception as e:
-            self.logger.error(f"❌ Ошибка отправки API запроса: {e}")
-            return False
+            self.logger.error(f"❌ Ошибка подготовки уведомления: {e}")
+        
+        channel.alert_sent = False
     
-    def process_frame(self, frame):
+    @staticmethod
+    def _window_text(seconds):
+        """Окно подсчета для текста уведомления: 60 -> "за последнюю минуту", 10 -> "за последние 10 сек" """
+        if seconds == 60:
+            return "за последнюю минуту"
+        if seconds % 60 == 0:
+            return f"за последние {seconds / 60:g} мин"
+        return f"за последние {seconds:g} сек"
+    
+    def send_api_alert(self, stranger_photo: tuple, screenshot: tuple, detection_count: int = None,
+                       extra_photos: list = None, camera: str = None, window_seconds: float = None):
+        """
+        Постановка уведомления в очередь на отправку.
+        stranger_photo и screenshot - (имя файла, bytes), изображения передаются из памяти.
+        extra_photos - дополнительные фото незнакомца (поля stranger_photo_2, stranger_photo_3, ...)
+        window_seconds - окно, за которое насчитано detection_count (по умолчанию alert_time_window)
+        Сама отправка (с повторами) идет в фоновом потоке AlertDispatcher,
+        поэтому мониторинг не ждет сеть
         """
-        Обрабатывает один кадр с камеры
+        if detection_count is None:
+            detection_count = self.channels[0].detection_counter
+        
+        if window_seconds is None:
+            window_seconds = self.alert_time_window
+        message = f"Обнаружено незнакомое лицо {detection_count} раз {self._window_text(window_seconds)}"
+        if camera and len(self.channels) > 1:
+            message += f" (камера {camera})"
+        
+        # Подготавливаем данные для отправки
+        alert_data = {
+            "computer_id": self.computer_id,
+            "command": "stranger_alert",
+            "timestamp": datetime.now().isoformat(),
+            "detection_count": detection_count,
+            "message": message
+        }
+        if camera:
+            alert_data["camera"] = camera
+        
+        files = {}
+        if stranger_photo:
+            files['stranger_photo'] = stranger_photo
+        if screenshot:
+            files['screenshot'] = screenshot
+        for index, photo in enumerate(extra_photos or [], start=2):
+            files[f'stranger_photo_{index}'] = photo
+        
+        return self.alert_dispatcher.submit(alert_data, files)
+    
+    def process_frame(self, frame, channel=None):
+        """
+        Обрабатывает один кадр с камеры (по умолчанию - первого канала)
         Возвращает True если обнаружен незнакомец
         """
+        channel = channel or self.channels[0]
+        start = time.perf_counter()
+        if self.process_pool is not None:
+            stranger_found = False
+            if self._gate_frame(channel, frame):
+                faces = self.process_pool.detect(frame)
+                stranger_found = self._handle_detections(channel, frame, faces, self.process_pool.identify)
+        else:
+            stranger_found = self.inference_pool.run(self._analyze_frame, channel, frame)
+        self._record_frame_metrics(start, stranger_found)
+        return stranger_found
+    
+    def _record_frame_metrics(self, start, stranger_found):
+        if self.startup.mark('first_frame'):
+            self.startup.log_report()
+        self.metrics.observe('frame', time.perf_counter() - start)
+        self.metrics.inc('frames_processed')
+        if stranger_found:
+            self.metrics.inc('stranger_frames')
+    
+    def _gate_frame(self, channel, frame):
+        """
+        Обновляет окна счетчиков и проверяет фильтр движения
+        Возвращает True если кадр нужно отдать детектору
+        """
+        # Старые обнаружения выпадают из окон и на кадрах без незнакомца
+        channel.rate_engine.tick()
+        
+        # 0. ФИЛЬТР ДВИЖЕНИЯ: статичную пустую сцену не отдаем детектору.
+        # Пока в кадре есть лица, детектор работает на каждом кадре
+        if channel.motion_gate_enabled and not channel.faces_present:
+            with self.metrics.time_stage('motion'):
+                has_motion = channel.motion_detector.has_motion(frame)
+            if not has_motion:
+                self.metrics.inc('frames_motion_skipped')
+                return False
+        return True
+    
+    def _analyze_frame(self, face_detector, channel, frame):
+        """
+        Фильтр движения, детекция, трекинг, распознавание и решение об уведомлении.
+        Выполняется на потоке пула инференса с его детектором
+        """
+        if not self._gate_frame(channel, frame):
+            return False
+        
         # 1. ДЕТЕКЦИЯ: Находим ВСЕ лица на кадре
-        faces = self.face_detector.detect_faces(frame)
+        faces = face_detector.detect_faces(frame)
+        return self._handle_detections(channel, frame, faces, self.face_recognizer.iter_identify)
+    
+    def _handle_detections(self, channel, frame, faces, identify):
+        """
+        Трекинг, распознавание и решение об уведомлении по найденным лицам.
+        identify(frame, boxes) - итератор (label, confidence) для боксов
+        """
+        channel.faces_present = len(faces) > 0
+        
+        # Вердикты треков получены прежней моделью - перепроверяем после ее смены
+        if channel.reverify_requested.is_set():
+            channel.reverify_requested.clear()
+            channel.face_tracker.invalidate_verdicts()
+        
+        # 2. ТРЕКИНГ: связываем лица с предыдущими кадрами
+        tracks = channel.face_tracker.update(faces)
         
         if len(faces) == 0:
             return False  # Лиц нет
         
-        self.logger.debug(f"📹 Обнаружено лиц: {len(faces)}")
+        self.logger.debug(f"📹 [{channel.name}] Обнаружено лиц: {len(faces)}")
         
-        # 2. ПРОВЕРКА: Для каждого лица проверяем, незнакомец ли он
-        stranger_found = False
-        for (x, y, w, h) in faces:
-            # Вырезаем область лица
-            face_roi = frame[y:y+h, x:x+w]
-            
-            # 3. РАСПОЗНАВАНИЕ: Сравниваем с известными лицами
-            if self.face_recognizer.is_stranger(face_roi):
-                stranger_found = True
-                break  # Достаточно одного незнакомца
+        # 3. ПРОВЕРКА: сначала смотрим кэш треков - известный незнакомец не требует распознавания
+        stranger_track = next(
+            (track for track in tracks
+             if track.is_stranger and not track.needs_recognition(self._reverify_interval(track))),
+            None
+        )
+        stranger_found = stranger_track is not None
+        # Считается только вердикт, полученный на этом кадре: кэш не добавляет обнаружений,
+        # иначе одна ошибка распознавания засчитывалась бы на каждом кадре трека
+        fresh_verdict = False
         
         if stranger_found:
-            # Обновляем счетчик обнаружений
-            self._update_detection_counter()
+            channel.recognitions_cached += len(tracks)
+        else:
+            # 4. РАСПОЗНАВАНИЕ: только для новых треков или по истечении интервала
+            pending = [track for track in tracks if track.needs_recognition(self._reverify_interval(track))]
+            channel.recognitions_cached += len(tracks) - len(pending)
             
-            # ПРОСТАЯ ПРОВЕРКА: если счетчик >= порога И еще не отправляли
-            if self.detection_counter >= self.alert_threshold and not self.alert_sent:
-                self.logger.info("🚨 Критическое количество обнаружений! Отправка уведомления...")
-                print(f"🚨 Обнаружено {self.detection_counter} раз за минуту! Отправка уведомления...")
+            results = identify(frame, [track.box for track in pending])
+            for track, (label, confidence) in zip(pending, results):
+                track.set_verdict(self.face_recognizer.is_stranger_result(label, confidence))
+                channel.recognitions_run += 1
                 
-                # Сохраняем фото незнакомца
-                stranger_photo = self.capture_stranger_photo(frame)
+                if track.is_stranger:
+                    self.logger.info(f"👤 [{channel.name}] Обнаружен незнакомец! (трек #{track.track_id}, уверенность: {confidence:.1f})")
+                    stranger_found = True
+                    fresh_verdict = True
+                    stranger_track = track
+                    break  # Достаточно одного незнакомца
+        
+        if stranger_found:
+            # Кадр-кандидат для доказательств (оценка и сжатие - в фоне)
+            channel.evidence_buffer.add(frame, stranger_track.box)
+        
+        if fresh_verdict:
+            # Обновляем счетчики; движок сам решает, пора ли уведомлять
+            # (порог любого окна достигнут, движок взведен, cooldown прошел)
+            should_alert = channel.rate_engine.record()
+            self.logger.debug(f"📊 [{channel.name}] Счетчик обнаружений: {channel.detection_counter}/{self.alert_threshold}")
+            
+            if should_alert:
+                self.logger.info(f"🚨 [{channel.name}] Критическое количество обнаружений! Отправка уведомления... ({channel.rate_engine.windows})")
+                window = channel.rate_engine.triggered_window
+                print(f"🚨 [{channel.name}] Обнаружено {window.count} раз за {window.seconds:g} сек! Отправка уведомления...")
                 
-                # Делаем скриншот
-                screenshot = self.take_screenshot()
+                # Движок уже разоружен: фото, скриншот и отправка идут в фоне,
+                # а при ошибке подготовки флаг будет сброшен
+                self.metrics.inc('alerts_triggered')
+                self._alert_executor.submit(self._collect_and_send_alert, channel, frame.copy(),
+                                            window.count, window.seconds)
+        
+        return stranger_found
+    
+    def _reverify_interval(self, track):
+        """
+        Как долго действует вердикт трека. Незнакомец перепроверяется часто:
+        каждое обнаружение для счетчика подтверждено распознаванием
+        """
+        return self.stranger_reverify_interval if track.is_stranger else self.recognition_reverify_interval
+    
+    def _channel_loop(self, channel):
+        """Цикл обработки одного канала: берет свежие кадры и отдает их в пул инференса"""
+        while self.is_running:
+            try:
+                # Берем самый свежий кадр (старые уже вытеснены потоком захвата)
+                latest = channel.frame_grabber.read(timeout=1.0)
+                if latest is None:
+                    continue
+                frame_id, frame_time, frame = latest
+                processing_start = time.time()
                 
-                # Отправляем уведомление через API
-                success = self.send_api_alert(stranger_photo, screenshot)
+                # Обрабатываем кадр
+                stranger_detected = self.process_frame(frame, channel)
                 
-                if success:
-                    # СТАВИМ ФЛАГ что отправили
-                    self.alert_sent = True
-                    self.logger.info("✅ Уведомление отправлено. Флаг установлен.")
+                if stranger_detected:
+                    if channel.last_detection_time is None:
+                        channel.last_detection_time = time.time()
+                        self.logger.info(f"👤 [{channel.name}] Обнаружен незнакомец...")
+                    
+                    # Показываем текущий счетчик каждые 5 обнаружений
+                    if channel.detection_counter % 5 == 0 and not channel.alert_sent:
+                        print(f"📊 [{channel.name}] Текущий счетчик: {channel.detection_counter}/{self.alert_threshold}")
+                        
                 else:
-                    self.logger.error("❌ Не удалось отправить уведомление. Флаг НЕ установлен.")
+                    # Сброс таймера если незнакомцев нет
+                    channel.last_detection_time = None
+                
+                # Задержка зависит от обстановки: чаще при лицах, реже в пустой комнате
+                channel.frame_scheduler.update(channel.faces_present, stranger_detected, channel.detection_counter)
+                time.sleep(channel.frame_scheduler.next_delay(time.time() - processing_start))
+                
+            except Exception as e:
+                self.logger.error(f"[{channel.name}] Ошибка в цикле обработки: {e}")
+                time.sleep(1)
+    
+    def _channel_loop_pipelined(self, channel):
+        """
+        Цикл канала для режима процессов: несколько кадров детектируются параллельно,
+        а результаты обрабатываются строго в порядке поступления кадров.
+        Кадры из кольца общей памяти уходят в процессы без копирования,
+        слот отпускается после обработки результата
+        """
+        in_flight = deque()
+        max_in_flight = self.process_pool.workers
+        ring = channel.frame_ring
+        identify = partial(self.process_pool.identify, frame_ring=ring)
         
-        return stranger_found
+        def release(frame):
+            slot = ring.slot_of(frame) if ring is not None else None
+            if slot is not None:
+                ring.release(slot)
+        
+        while self.is_running:
+            try:
+                loop_start = time.time()
+                latest = channel.frame_grabber.read(timeout=1.0)
+                if latest is not None:
+                    frame_id, frame_time, frame = latest
+                    start = time.perf_counter()
+                    future = None
+                    try:
+                        if self._gate_frame(channel, frame):
+                            future = self.process_pool.submit_detect(frame, frame_ring=ring)
+                    finally:
+                        in_flight.append((start, frame, future))
+                
+                # Забираем результаты по порядку: ждем голову очереди, если очередь полна
+                while in_flight and (len(in_flight) >= max_in_flight or latest is None
+                                     or in_flight[0][2] is None or in_flight[0][2].done()):
+                    start, frame, future = in_flight[0]
+                    stranger_detected = False
+                    try:
+                        if future is not None:
+                            faces = future.result()
+                            stranger_detected = self._handle_detections(channel, frame, faces, identify)
+                    finally:
+                        in_flight.popleft()
+                        release(frame)
+                    self._record_frame_metrics(start, stranger_detected)
+                    
+                    if not stranger_detected:
+                        channel.last_detection_time = None
+                    elif channel.last_detection_time is None:
+                        channel.last_detection_time = time.time()
+                        self.logger.info(f"👤 [{channel.name}] Обнаружен незнакомец...")
+                    
+                    channel.frame_scheduler.update(channel.faces_present, stranger_detected, channel.detection_counter)
+                
+                # Планировщик задает темп поступления кадров в конвейер
+                time.sleep(channel.frame_scheduler.next_delay(time.time() - loop_start))
+                
+            except Exception as e:
+                self.logger.error(f"[{channel.name}] Ошибка в цикле обработки: {e}")
+                self._drain_in_flight(in_flight, release)
+                time.sleep(1)
+        
+        # Слоты кольца нельзя освобождать, пока процессы читают из них кадры
+        self._drain_in_flight(in_flight, release)
+    
+    def _drain_in_flight(self, in_flight, release):
+        """Дожидается кадров в конвейере без обработки результатов и отпускает их слоты"""
+        while in_flight:
+            start, frame, future = in_flight.popleft()
+            if future is not None:
+                try:
+                    future.result()
+                except Exception:
+                    pass
+            release(frame)
     
     def start_monitoring(self):
         """Запуск мониторинга"""
@@ -271,70 +703,152 @@ class ComputerGuard:
         self.is_running = True
         self.logger.info("🚀 Запуск мониторинга...")
         
+        # Подключаем все источники одновременно (открытие камеры - до нескольких секунд);
+        # мониторинг работает, если открылся хотя бы один
+        with ThreadPoolExecutor(max_workers=len(self.channels), thread_name_prefix="CameraOpen") as executor:
+            opened = list(executor.map(self._open_channel, self.channels))
+        active_channels = [channel for channel, ok in zip(self.channels, opened) if ok]
+        
+        if not active_channels:
+            self.logger.error("❌ Не удалось открыть ни одной камеры!")
+            print("❌ Веб-камера не найдена или недоступна!")
+            self.is_running = False
+            self._close_channels()
+            return
+        
+        # Модели в пуле инференса загружались, пока открывались камеры
         try:
-            # Пробуем открыть камеру
-            cap = cv2.VideoCapture(0)
-            
-            # Проверяем, открылась ли камера
-            if not cap.isOpened():
-                self.logger.error("❌ Не удалось открыть веб-камеру!")
-                print("❌ Веб-камера не найдена или недоступна!")
-                return
-                    
-            self.logger.info("✅ Камера успешно подключена")
-            
-            # Устанавливаем разрешение
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            
+            self.wait_inference_ready()
         except Exception as e:
-            self.logger.error(f"❌ Ошибка инициализации камеры: {e}")
-            print(f"❌ Ошибка камеры: {e}")
+            self.logger.error(f"❌ Не удалось запустить пул инференса: {e}")
+            print(f"❌ Ошибка загрузки моделей: {e}")
+            self.is_running = False
+            self._close_channels()
             return
         
+        self._register_metric_collectors()
+        self.metrics.start()
+        if self.model_watcher is not None:
+            self.model_watcher.start()
+        
         print("\n🎥 Мониторинг запущен! Система охраны активна.")
+        print(f"📷 Активных камер: {len(active_channels)} из {len(self.channels)}")
         print(f"📊 Настройки обнаружения: {self.alert_threshold} раз за {self.alert_time_window} сек")
         print("💡 Уведомление отправляется ОДИН РАЗ при достижении порога")
         print("👤 Подойдите к камере для тестирования")
         print("⏹️  Нажмите Ctrl+C для остановки\n")
         
-        while self.is_running:
-            try:
-                ret, frame = cap.read()
-                if not ret:
-                    self.logger.warning("⚠️ Не удалось получить кадр с камеры")
-                    continue
-                
-                # Обрабатываем кадр
-                stranger_detected = self.process_frame(frame)
-                
-                if stranger_detected:
-                    if self.last_detection_time is None:
-                        self.last_detection_time = time.time()
-                        self.logger.info("👤 Обнаружен незнакомец...")
-                    
-                    # Показываем текущий счетчик каждые 5 обнаружений
-                    if self.detection_counter % 5 == 0 and not self.alert_sent:
-                        print(f"📊 Текущий счетчик: {self.detection_counter}/{self.alert_threshold}")
-                        
-                else:
-                    # Сброс таймера если незнакомцев нет
-                    self.last_detection_time = None
-                
-                # Задержка для снижения нагрузки
+        channel_loop = self._channel_loop_pipelined if self.process_pool is not None else self._channel_loop
+        for channel in active_channels:
+            channel.thread = threading.Thread(
+                target=channel_loop, args=(channel,), name=f"Channel-{channel.name}", daemon=True
+            )
+            channel.thread.start()
+        
+        # Главный поток только ждет остановки (Ctrl+C приходит сюда).
+        # Остановка выполняется при любом выходе, иначе потоки и общая память остаются
+        try:
+            while self.is_running:
                 time.sleep(0.5)
-                
-            except Exception as e:
-                self.logger.error(f"Ошибка в основном цикле: {e}")
-                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stop_monitoring()
+        finally:
+            self.is_running = False
+            self._shutdown(active_channels)
+    
+    def _shutdown(self, active_channels):
+        """Дожидается потоков каналов и останавливает все компоненты охраны"""
+        for channel in active_channels:
+            channel.thread.join(timeout=5)
         
-        if 'cap' in locals():
-            cap.release()
+        if self.model_watcher is not None:
+            self.model_watcher.stop()
+            self.logger.info(f"📊 Статистика перезагрузок модели: {self.model_watcher.get_stats()}")
+        self._close_channels()
+        self._close_inference()
+        # Дожидаемся уведомления, которое еще собирается
+        self._alert_executor.shutdown(wait=True)
+        self._screenshot_executor.shutdown(wait=True)
+        self.logger.info(f"📊 Статистика уведомлений: {self.alert_dispatcher.get_stats()}")
+        # Финальная выгрузка метрик - пока хранилище уведомлений открыто
+        self.metrics.stop()
+        self.alert_dispatcher.stop()
         self.logger.info("⛔ Мониторинг остановлен")
         print("⛔ Мониторинг остановлен")
     
+    def _reload_model(self):
+        """
+        Загружает переобученную модель (в потоке ModelWatcher) и заменяет текущую.
+        Каналы продолжают работу: кадры, уже взятые в обработку, распознаются
+        прежней моделью, следующие - новой. Возвращает True если модель заменена
+        """
+        start = time.perf_counter()
+        model = self.face_recognizer.load_model()
+        if model is None:
+            self.logger.error("❌ Новая модель не загружена - охрана продолжает работу с прежней")
+            return False
+        
+        # Процессы инференса загружают модель заранее, чтобы после переключения
+        # главный процесс и воркеры использовали одни и те же имена и метки
+        version = None
+        if self.process_pool is not None:
+            version = self.process_pool.preload_model()
+            if version is None:
+                self.logger.error("❌ Процессы инференса не загрузили новую модель - охрана продолжает работу с прежней")
+                return False
+        
+        self.face_recognizer.set_model(model)
+        if version is not None:
+            self.process_pool.activate_model(version)
+        
+        # Вердикты треков получены прежней моделью - новое лицо могло стать известным.
+        # Треки сбрасывает поток обработки канала перед следующим кадром
+        for channel in self.channels:
+            channel.request_reverify()
+        
+        self.metrics.inc('model_reloads')
+        self.logger.info(f"🔄 Модель перезагружена за {(time.perf_counter() - start) * 1000:.0f} мс: "
+                         f"{len(self.face_recognizer.known_face_names)} лиц")
+        return True
+    
+    def _open_channel(self, channel):
+        """Открывает источник кадров канала. Возвращает True при успехе"""
+        try:
+            with self.startup.phase('camera_open', camera=channel.name):
+                opened = channel.open()
+        except Exception as e:
+            self.logger.error(f"❌ Ошибка инициализации камеры {channel.name}: {e}")
+            print(f"❌ Ошибка камеры {channel.name}: {e}")
+            return False
+        
+        if opened:
+            self.logger.info(f"✅ Камера {channel.name} ({channel.source}) успешно подключена")
+        else:
+            print(f"❌ Камера {channel.name} ({channel.source}) не найдена или недоступна!")
+        return opened
+    
+    def wait_inference_ready(self):
+        """Дожидается загрузки моделей в пуле инференса (этап inference_warmup отсчитывается от создания пула)"""
+        pool = self.process_pool if self.process_pool is not None else self.inference_pool
+        pool.wait_ready()
+        self.startup.record('inference_warmup', self._inference_started)
+    
+    def _close_channels(self):
+        for channel in self.channels:
+            channel.close()
+            self.logger.info(f"📊 [{channel.name}] Статистика: {channel.get_stats()}")
+    
+    def _close_inference(self):
+        """Останавливает пул инференса (потоков или процессов)"""
+        if self.process_pool is not None:
+            self.process_pool.close()
+        else:
+            self.inference_pool.close()
+    
     def stop_monitoring(self):
         """Остановка мониторинга"""
         self.is_running = False
+        for channel in self.channels:
+            channel.frame_grabber.stop()
         self.logger.info("🛑 Остановка системы охраны...")
-        print("🛑 Остановка системы охраны...")
\ No newline at end of file
+        print("🛑 Остановка системы охраны...")
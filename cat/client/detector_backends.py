@@ -0,0 +1,147 @@
+import cv2
+import logging
+from pathlib import Path
+
+
+class DetectorBackend:
+    """
+    Бэкенд детектора лиц.
+    prepare(image) - подготовка кадра BGR (конвертация цвета),
+    detect(prepared) - боксы [(x, y, width, height), ...] в координатах переданного кадра
+    """
+
+    name = None
+
+    def prepare(self, image):
+        return image
+
+    def detect(self, prepared):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MediaPipeBackend(DetectorBackend):
+    """MediaPipe Face Detection: model_selection=0 - ближние лица (до ~2 м), 1 - дальние (до ~5 м)"""
+
+    def __init__(self, model_selection=0, min_confidence=0.5):
+        # MediaPipe - тяжелый импорт, загружаем только если выбран этот бэкенд
+        import mediapipe as mp
+
+        self.name = 'mediapipe_full' if model_selection else 'mediapipe_short'
+        self.face_detection = mp.solutions.face_detection.FaceDetection(
+            model_selection=model_selection,
+            min_detection_confidence=min_confidence
+        )
+
+    def prepare(self, image):
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    def detect(self, prepared):
+        h, w = prepared.shape[:2]
+        results = self.face_detection.process(prepared)
+
+        faces = []
+        if results.detections:
+            for detection in results.detections:
+                # Относительные координаты -> абсолютные
+                bbox = detection.location_data.relative_bounding_box
+                faces.append((bbox.xmin * w, bbox.ymin * h, bbox.width * w, bbox.height * h))
+        return faces
+
+    def close(self):
+        self.face_detection.close()
+
+
+class YuNetBackend(DetectorBackend):
+    """
+    OpenCV FaceDetectorYN (YuNet, ONNX) - быстрая DNN-модель без MediaPipe.
+    Файл модели: https://github.com/opencv/opencv_zoo/tree/main/models/face_detection_yunet
+    """
+
+    name = 'yunet'
+
+    def __init__(self, model_path, min_confidence=0.5, nms_threshold=0.3, top_k=50):
+        if not Path(model_path).exists():
+            raise FileNotFoundError(f"Модель YuNet не найдена: {model_path}")
+
+        self._input_size = (320, 320)
+        self.detector = cv2.FaceDetectorYN.create(
+            str(model_path), "", self._input_size,
+            score_threshold=min_confidence,
+            nms_threshold=nms_threshold,
+            top_k=top_k
+        )
+
+    def detect(self, prepared):
+        h, w = prepared.shape[:2]
+        # Размер входа задается под кадр, пересоздания сети при этом нет
+        if self._input_size != (w, h):
+            self._input_size = (w, h)
+            self.detector.setInputSize(self._input_size)
+
+        _, detections = self.detector.detect(prepared)
+        if detections is None:
+            return []
+        # Строка: x, y, w, h, 5 точек лица (10 значений), уверенность
+        return [(row[0], row[1], row[2], row[3]) for row in detections]
+
+
+class HaarBackend(DetectorBackend):
+    """Каскад Хаара из OpenCV - самый легкий вариант для слабых CPU, только фронтальные лица"""
+
+    name = 'haar'
+
+    def __init__(self, scale_factor=1.1, min_neighbors=5, min_size=30):
+        cascade_path = Path(cv2.data.haarcascades) / 'haarcascade_frontalface_default.xml'
+        self.cascade = cv2.CascadeClassifier(str(cascade_path))
+        if self.cascade.empty():
+            raise FileNotFoundError(f"Каскад Хаара не найден: {cascade_path}")
+
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = (min_size, min_size)
+
+    def prepare(self, image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return cv2.equalizeHist(gray)
+
+    def detect(self, prepared):
+        faces = self.cascade.detectMultiScale(
+            prepared,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=self.min_size
+        )
+        return [tuple(face) for face in faces]
+
+
+BACKENDS = ('mediapipe_short', 'mediapipe_full', 'yunet', 'haar')
+DEFAULT_BACKEND = 'mediapipe_short'
+DEFAULT_YUNET_MODEL = 'models/face_detection_yunet_2023mar.onnx'
+
+
+def create_backend(name, min_confidence=0.5, model_path=None):
+    """Создает бэкенд детектора по имени из config.txt (detector_backend)"""
+    if name == 'mediapipe_short':
+        return MediaPipeBackend(model_selection=0, min_confidence=min_confidence)
+    if name == 'mediapipe_full':
+        return MediaPipeBackend(model_selection=1, min_confidence=min_confidence)
+    if name == 'yunet':
+        return YuNetBackend(model_path or DEFAULT_YUNET_MODEL, min_confidence=min_confidence)
+    if name == 'haar':
+        return HaarBackend()
+    raise ValueError(f"Неизвестный бэкенд детектора: {name} (доступны: {', '.join(BACKENDS)})")
+
+
+def create_backend_with_fallback(name, min_confidence=0.5, model_path=None):
+    """Как create_backend, но при ошибке создания откатывается на бэкенд по умолчанию"""
+    try:
+        return create_backend(name, min_confidence, model_path)
+    except Exception as e:
+        if name == DEFAULT_BACKEND:
+            raise
+        logging.getLogger(__name__).error(f"❌ Бэкенд детектора {name} недоступен: {e}. "
+                                          f"Используется {DEFAULT_BACKEND}")
+        return create_backend(DEFAULT_BACKEND, min_confidence)
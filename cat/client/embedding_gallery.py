@@ -0,0 +1,139 @@
+import logging
+import numpy as np
+from pathlib import Path
+
+from .gallery_index import GalleryIndex, squared_distances
+from .model_files import save_generation, load_generation, read_header
+
+# Галерея эмбеддингов известных лиц рядом с моделью LBPH:
+# заголовок и массивы текущего поколения embeddings.g<N>.npy, embedding_labels.g<N>.npy
+GALLERY_HEADER = "embeddings_header.json"
+EMBEDDINGS = "embeddings"
+EMBEDDING_LABELS = "embedding_labels"
+EMBEDDING_SIZE = 128
+
+
+def compute_embeddings(rgb_image, boxes, num_jitters=1, model='small'):
+    """
+    128-мерные эмбеддинги лиц (dlib через face_recognition) для боксов (x, y, width, height)
+    Возвращает массив float32 (len(boxes), 128)
+    """
+    # face_recognition тянет dlib - тяжелый импорт, загружаем только для этого бэкенда
+    import face_recognition
+
+    # face_recognition ожидает (top, right, bottom, left)
+    locations = [(y, x + w, y + h, x) for x, y, w, h in boxes]
+    encodings = face_recognition.face_encodings(
+        rgb_image, known_face_locations=locations, num_jitters=num_jitters, model=model
+    )
+    return np.asarray(encodings, dtype=np.float32).reshape(len(boxes), EMBEDDING_SIZE)
+
+
+class EmbeddingGallery:
+    """
+    Галерея известных лиц: все эмбеддинги - одна непрерывная матрица float32 (N, 128).
+    Пакет лиц сравнивается со всей галереей одним матричным умножением:
+    |q - g|^2 = |q|^2 + |g|^2 - 2 q·g, квадраты норм галереи считаются при загрузке.
+    Для больших галерей можно включить приближенный индекс (GalleryIndex, IVF):
+    тогда поиск идет только по индексу, и полная матрица в память не загружается
+    """
+
+    def __init__(self, use_index=False, nprobe=8):
+        self.logger = logging.getLogger(__name__)
+        self.embeddings = np.empty((0, EMBEDDING_SIZE), dtype=np.float32)
+        self.labels = np.empty(0, dtype=np.int32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self.use_index = use_index
+        self.nprobe = nprobe
+        self.index = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def set(self, embeddings, labels):
+        """Заменяет содержимое галереи"""
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.labels = np.ascontiguousarray(labels, dtype=np.int32)
+        self._norms = np.einsum('ij,ij->i', self.embeddings, self.embeddings)
+        self.index = None
+
+    @staticmethod
+    def exists(db_path):
+        return (Path(db_path) / GALLERY_HEADER).exists()
+
+    @staticmethod
+    def read(db_path):
+        """Эмбеддинги и метки галереи из db_path (в памяти). Возвращает (эмбеддинги, метки) или None"""
+        loaded = load_generation(db_path, GALLERY_HEADER, (EMBEDDINGS, EMBEDDING_LABELS), mmap=False)
+        if loaded is None:
+            return None
+        header, arrays = loaded
+        return arrays[EMBEDDINGS], arrays[EMBEDDING_LABELS]
+
+    def load(self, db_path="known_faces_db"):
+        """Загружает галерею из db_path. Возвращает True если галерея найдена"""
+        db_path = Path(db_path)
+        header = read_header(db_path / GALLERY_HEADER)
+        if header is None:
+            self.logger.error(f"❌ Галерея эмбеддингов не найдена в {db_path}! Переобучите систему.")
+            return False
+
+        if self.use_index and self._load_index(db_path, header.get('samples')):
+            return True
+
+        gallery = self.read(db_path)
+        if gallery is None:
+            self.logger.error(f"❌ Галерея эмбеддингов не найдена в {db_path}! Переобучите систему.")
+            return False
+        self.set(*gallery)
+        self.logger.info(f"✅ Загружена галерея эмбеддингов: {len(self)} образцов")
+        return True
+
+    def _load_index(self, db_path, samples):
+        """
+        Открывает индекс вместо полной матрицы (векторы индекса - те же образцы).
+        Возвращает False если индекса нет или он построен по другой галерее
+        """
+        index = GalleryIndex.load(db_path, nprobe=self.nprobe)
+        if index is None:
+            self.logger.warning("⚠️ Индекс галереи не найден - используется полный перебор")
+            return False
+        if len(index) != samples:
+            self.logger.warning(f"⚠️ Индекс галереи ({len(index)} образцов) не соответствует галерее "
+                                f"({samples}) - используется полный перебор")
+            return False
+
+        self.index = index
+        self.labels = index.labels
+        self.logger.info(f"✅ Галерея эмбеддингов: {len(self)} образцов в индексе, "
+                         f"{index.nlist} списков, nprobe={self.nprobe}")
+        return True
+
+    @staticmethod
+    def save(db_path, embeddings, labels):
+        """Сохраняет галерею в db_path новым поколением файлов"""
+        arrays = {
+            EMBEDDINGS: np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_SIZE),
+            EMBEDDING_LABELS: np.asarray(labels, dtype=np.int32),
+        }
+        save_generation(db_path, GALLERY_HEADER, arrays, {'samples': len(arrays[EMBEDDING_LABELS])})
+
+    def match(self, queries):
+        """
+        Ближайший образец галереи для каждого эмбеддинга из queries (M, 128)
+        Возвращает (метки, евклидовы расстояния) - массивы длины M; метка -1 при пустой галерее
+        """
+        count = len(queries)
+        if self.index is not None:
+            return self.index.search(queries)
+        if len(self) == 0:
+            return np.full(count, -1, dtype=np.int32), np.full(count, np.inf, dtype=np.float32)
+
+        queries = np.asarray(queries, dtype=np.float32)
+        # (M, N) квадратов расстояний одним умножением матриц
+        distances = squared_distances(queries, self.embeddings, self._norms)
+
+        best = np.argmin(distances, axis=1)
+        best_distances = distances[np.arange(count), best]
+        # Погрешность округления может дать слегка отрицательный квадрат
+        return self.labels[best], np.sqrt(np.maximum(best_distances, 0))
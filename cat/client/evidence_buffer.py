@@ -0,0 +1,100 @@
+import cv2
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class EvidenceBuffer:
+    """
+    Кольцевой буфер последних кадров с незнакомцем для уведомления.
+    Кадры хранятся сжатыми в JPEG, каждому выставляется оценка по резкости
+    и размеру лица. Оценка и сжатие выполняются в отдельном потоке.
+    """
+
+    def __init__(self, max_frames=15, min_interval=0.2, jpeg_quality=90, clock=time.time):
+        self.logger = logging.getLogger(__name__)
+        self.clock = clock
+        self.max_frames = max_frames
+        # Минимальный интервал между кадрами в буфере (сек)
+        self.min_interval = min_interval
+        self.jpeg_quality = jpeg_quality
+
+        self._frames = deque(maxlen=max_frames)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="EvidenceBuffer")
+        self._pending = 0
+        self._last_add_time = 0.0
+
+        # Статистика
+        self.frames_added = 0
+        self.frames_skipped = 0
+
+    @staticmethod
+    def score_face(frame, box):
+        """
+        Оценка качества лица: резкость (дисперсия Лапласиана) с учетом размера.
+        Мелкие лица получают меньший вес - их хуже видно на фото
+        """
+        x, y, w, h = box
+        face = frame[max(0, y):y + h, max(0, x):x + w]
+        if face.size == 0:
+            return 0.0
+
+        gray = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+        gray = cv2.resize(gray, (100, 100), interpolation=cv2.INTER_AREA)
+        sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+        size_factor = min(1.0, (w * h) / (100 * 100))
+        return sharpness * size_factor
+
+    def add(self, frame, box):
+        """
+        Добавляет кадр с незнакомцем (box - лицо незнакомца)
+        Не блокирует вызывающий поток: оценка и сжатие идут в фоне
+        """
+        now = self.clock()
+        # Не чаще min_interval и не копим очередь, если фоновый поток не успевает
+        if now - self._last_add_time < self.min_interval or self._pending >= 2:
+            self.frames_skipped += 1
+            return
+
+        self._last_add_time = now
+        with self._lock:
+            self._pending += 1
+        self._executor.submit(self._process, frame.copy(), box, now)
+
+    def _process(self, frame, box, timestamp):
+        """Оценивает и сжимает кадр (в фоновом потоке)"""
+        try:
+            score = self.score_face(frame, box)
+            ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                return
+
+            with self._lock:
+                self._frames.append((score, timestamp, buffer.tobytes()))
+            self.frames_added += 1
+        except Exception as e:
+            self.logger.error(f"Ошибка обработки кадра для доказательств: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def best(self, count=3):
+        """
+        Возвращает до count лучших кадров: список (оценка, время, jpeg bytes),
+        лучший первым
+        """
+        with self._lock:
+            frames = list(self._frames)
+        return sorted(frames, key=lambda item: item[0], reverse=True)[:count]
+
+    def clear(self):
+        """Очищает буфер (после отправки уведомления)"""
+        with self._lock:
+            self._frames.clear()
+
+    def close(self):
+        """Останавливает фоновый поток"""
+        self._executor.shutdown(wait=False)
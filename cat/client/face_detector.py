@@ -1,49 +1,64 @@
 import cv2
-import mediapipe as mp
+import time
 import logging
 import numpy as np
 
+from .detector_backends import DEFAULT_BACKEND, create_backend_with_fallback
+
 class FaceDetector:
-    """Детектор лиц используя MediaPipe - находит ЛЮБЫЕ лица"""
+    """Детектор лиц - находит ЛЮБЫЕ лица (бэкенд выбирается в config.txt)"""
     
-    def __init__(self):
+    def __init__(self, detection_scale=1.0, metrics=None, backend=DEFAULT_BACKEND, min_confidence=0.5,
+                 model_path=None):
         self.logger = logging.getLogger(__name__)
+        self.metrics = metrics
+        
+        # Масштаб копии кадра, на которой работает детектор (1.0 - полный размер).
+        # Боксы всегда возвращаются в координатах исходного кадра
+        self.detection_scale = min(max(detection_scale, 0.1), 1.0)
         
-        # Инициализация MediaPipe Face Detection
-        self.mp_face_detection = mp.solutions.face_detection
-        self.mp_drawing = mp.solutions.drawing_utils
-        self.face_detection = self.mp_face_detection.FaceDetection(
-            model_selection=0,  # 0 для ближних лиц, 1 для дальних
-            min_detection_confidence=0.5
-        )
+        # Бэкенд: mediapipe_short, mediapipe_full, yunet или haar
+        self.backend = create_backend_with_fallback(backend, min_confidence=min_confidence, model_path=model_path)
         
-        self.logger.info("✅ Детектор лиц (MediaPipe) инициализирован")
+        self.logger.info(f"✅ Детектор лиц ({self.backend.name}) инициализирован, масштаб детекции: {self.detection_scale}")
     
     def detect_faces(self, image):
         """
-        Находит все лица на изображении используя MediaPipe
+        Находит все лица на изображении
         Возвращает список bounding boxes: [(x, y, width, height), ...]
         """
         try:
-            # Конвертируем BGR в RGB
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            start = time.perf_counter()
+            h, w = image.shape[:2]
+            
+            # Детектор работает на уменьшенной копии кадра
+            if self.detection_scale < 1.0:
+                small = cv2.resize(image, None, fx=self.detection_scale, fy=self.detection_scale,
+                                   interpolation=cv2.INTER_AREA)
+            else:
+                small = image
+            
+            # Конвертация цвета под бэкенд (RGB, оттенки серого или без изменений)
+            prepared = self.backend.prepare(small)
+            converted = time.perf_counter()
             
             # Детектируем лица
-            results = self.face_detection.process(rgb_image)
+            detections = self.backend.detect(prepared)
+            
+            if self.metrics is not None:
+                self.metrics.observe('convert', converted - start)
+                self.metrics.observe('detect', time.perf_counter() - converted)
             
             faces = []
-            if results.detections:
-                for detection in results.detections:
-                    # Получаем bounding box
-                    bboxC = detection.location_data.relative_bounding_box
-                    h, w, _ = image.shape
-                    
-                    # Конвертируем в абсолютные координаты
-                    x = int(bboxC.xmin * w)
-                    y = int(bboxC.ymin * h)
-                    width = int(bboxC.width * w)
-                    height = int(bboxC.height * h)
-                    
+            inverse_scale = w / small.shape[1]
+            for bx, by, bw, bh in detections:
+                # Конвертируем в абсолютные координаты исходного кадра
+                x = max(0, int(bx * inverse_scale))
+                y = max(0, int(by * inverse_scale))
+                width = min(w, int((bx + bw) * inverse_scale)) - x
+                height = min(h, int((by + bh) * inverse_scale)) - y
+                
+                if width > 0 and height > 0:
                     faces.append((x, y, width, height))
             
             return faces
@@ -53,6 +68,6 @@ class FaceDetector:
             return []
     
     def __del__(self):
-        """Закрываем ресурсы MediaPipe"""
-        if hasattr(self, 'face_detection'):
-            self.face_detection.close()
\ No newline at end of file
+        """Закрываем ресурсы бэкенда"""
+        if hasattr(self, 'backend'):
+            self.backend.close()
\ No newline at end of file
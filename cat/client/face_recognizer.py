@@ -1,69 +1,181 @@
 import cv2
+import time
 import pickle
 import os
 import logging
 import numpy as np
 from pathlib import Path
 import json
+import threading
+
+from .embedding_gallery import EmbeddingGallery, compute_embeddings
+from .lbph_store import LBPHStore
+
+
+class FaceModel:
+    """
+    Загруженная модель распознавания: имена, метки и одна из моделей
+    (бинарная LBPH, face_model.yml через OpenCV или галерея эмбеддингов).
+    При перезагрузке заменяется целиком одним присваиванием
+    """
+    
+    def __init__(self, names=None, label_map=None, lbph_store=None, recognizer=None, gallery=None):
+        self.names = names or []
+        self.label_map = label_map or {}
+        self.lbph_store = lbph_store
+        self.recognizer = recognizer
+        self.gallery = gallery
+    
+    def predict(self, face):
+        """LBPH predict по бинарной модели или через OpenCV"""
+        if self.lbph_store is not None:
+            return self.lbph_store.predict(face)
+        return self.recognizer.predict(face)
+
 
 class FaceRecognizer:
-    """Распознавание лиц используя LBPH из OpenCV"""
+    """
+    Распознавание лиц: LBPH из OpenCV (по умолчанию)
+    или эмбеддинги face_recognition (dlib) с галереей в виде одной матрицы
+    """
     
-    def __init__(self):
+    # Размер, к которому приводится лицо перед распознаванием
+    FACE_SIZE = (100, 100)
+    # confidence < 50 - хорошее совпадение, > 80 - плохое
+    CONFIDENCE_THRESHOLD = 70
+    # Для эмбеддингов confidence - евклидово расстояние: < 0.6 - тот же человек
+    DISTANCE_THRESHOLD = 0.6
+    
+    def __init__(self, metrics=None, backend='lbph', distance_threshold=DISTANCE_THRESHOLD,
+                 ann_index=False, ann_nprobe=8, db_path="known_faces_db"):
         self.logger = logging.getLogger(__name__)  # ДОБАВЬТЕ ЭТУ СТРОКУ
-        self.recognizer = cv2.face.LBPHFaceRecognizer_create()
-        self.known_face_names = []
-        self.label_map = {}
+        self.metrics = metrics
+        # lbph или embedding
+        self.backend = backend
+        self.db_path = Path(db_path)
+        # Для больших галерей - приближенный индекс IVF вместо полного перебора
+        self.ann_index = ann_index
+        self.ann_nprobe = ann_nprobe
+        # В обоих режимах меньше - лучше; значение >= порога - незнакомец
+        self.confidence_threshold = distance_threshold if backend == 'embedding' else self.CONFIDENCE_THRESHOLD
+        # Текущая модель; потоки распознавания берут ссылку на нее один раз на кадр
+        self.model = FaceModel()
+        # Сколько раз модель успешно загружалась
+        self.model_version = 0
+        # Переиспользуемый буфер для пакетной подготовки лиц (свой у каждого потока инференса)
+        self._local = threading.local()
         self.load_trained_model()
     
+    @property
+    def known_face_names(self):
+        return self.model.names
+    
+    @property
+    def label_map(self):
+        return self.model.label_map
+    
+    @property
+    def lbph_store(self):
+        return self.model.lbph_store
+    
+    @property
+    def gallery(self):
+        return self.model.gallery
+    
     def load_trained_model(self):
-        """Загружает обученную модель"""
-        model_path = Path("known_faces_db/face_model.yml")
-        labels_path = Path("known_faces_db/labels.json")
+        """
+        Загружает обученную модель: бинарную (lbph_*.npy, открывается мгновенно)
+        или, если ее нет, прежний face_model.yml.
+        Новая модель полностью загружается и проверяется, а затем заменяет текущую
+        одним присваиванием - распознавание не прерывается, а при ошибке
+        остается прежняя модель. Возвращает True если модель загружена
+        """
+        model = self.load_model()
+        if model is None:
+            return False
+        self.set_model(model)
+        return True
+    
+    def set_model(self, model):
+        """Делает загруженную модель текущей"""
+        self.model = model
+        self.model_version += 1
+    
+    def load_model(self):
+        """
+        Загружает и проверяет модель из self.db_path, не заменяя текущую
+        Возвращает FaceModel или None
+        """
+        db_path = self.db_path
+        model_path = db_path / "face_model.yml"
+        labels_path = db_path / "labels.json"
+        has_store = LBPHStore.exists(db_path)
         
-        if not model_path.exists() or not labels_path.exists():
+        if not (has_store or model_path.exists()) or not labels_path.exists():
             self.logger.error("❌ Модель не найдена! Сначала обучите систему.")
-            return False
+            return None
         
         try:
-            # Загружаем модель
-            self.recognizer.read(str(model_path))
-            
             # Загружаем метки
             with open(labels_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-                self.known_face_names = data['names']
-                self.label_map = data['label_map']
+            model = FaceModel(names=data['names'], label_map=data['label_map'])
             
-            self.logger.info(f"✅ Загружена модель для {len(self.known_face_names)} лиц")
-            return True
+            # Загружаем модель
+            start = time.perf_counter()
+            if self.backend == 'embedding':
+                model.gallery = EmbeddingGallery(use_index=self.ann_index, nprobe=self.ann_nprobe)
+                if not model.gallery.load(db_path):
+                    return None
+                labels = model.gallery.labels
+            elif has_store:
+                model.lbph_store = LBPHStore.load(db_path)
+                labels = model.lbph_store.labels
+            else:
+                self.logger.info("ℹ️ Текстовая модель face_model.yml - переобучите систему для быстрой загрузки")
+                model.recognizer = cv2.face.LBPHFaceRecognizer_create()
+                model.recognizer.read(str(model_path))
+                labels = model.recognizer.getLabels()
+            self.logger.info(f"⏱️ Модель загружена за {(time.perf_counter() - start) * 1000:.0f} мс")
+            
+            # Метки модели и labels.json записываются обучением по очереди - проверяем, что они согласованы
+            if len(labels) and not 0 <= int(np.min(labels)) <= int(np.max(labels)) < len(model.names):
+                raise ValueError(f"метки модели не соответствуют labels.json ({len(model.names)} имен)")
+            
+            self.logger.info(f"✅ Загружена модель для {len(model.names)} лиц")
+            return model
             
         except Exception as e:
             self.logger.error(f"❌ Ошибка загрузки модели: {e}")
-            return False
+            return None
     
     def is_stranger(self, face_image):
         """
         Проверяет, является ли лицо незнакомцем
         Возвращает True если лицо НЕ найдено в базе известных
         """
-        if not self.known_face_names:
+        model = self.model
+        if not model.names:
             self.logger.warning("Модель не загружена - все лица считаются незнакомцами")
             return True
         
         try:
-            # Преобразуем в grayscale
-            gray_face = cv2.cvtColor(face_image, cv2.COLOR_BGR2GRAY)
-            
-            # Изменяем размер для стандартизации
-            gray_face = cv2.resize(gray_face, (100, 100))
-            
-            # Пытаемся распознать лицо
-            label, confidence = self.recognizer.predict(gray_face)
+            if self.backend == 'embedding':
+                # Все изображение - это лицо
+                h, w = face_image.shape[:2]
+                label, confidence = self.identify_batch(face_image, [(0, 0, w, h)])[0]
+            else:
+                # Преобразуем в grayscale
+                gray_face = cv2.cvtColor(face_image, cv2.COLOR_BGR2GRAY)
+                
+                # Изменяем размер для стандартизации
+                gray_face = cv2.resize(gray_face, self.FACE_SIZE)
+                
+                # Пытаемся распознать лицо
+                label, confidence = model.predict(gray_face)
             
-            # confidence < 50 - хорошее совпадение, > 80 - плохое
-            if confidence < 70:  # Пороговое значение
-                name = self.known_face_names[label]
+            if not self.is_stranger_result(label, confidence):
+                name = model.names[label]
                 self.logger.debug(f"✅ Распознан: {name} (уверенность: {confidence:.1f})")
                 return False
             else:
@@ -72,4 +184,123 @@ class FaceRecognizer:
                 
         except Exception as e:
             self.logger.error(f"Ошибка распознавания лица: {e}")
-            return True
\ No newline at end of file
+            return True
+    
+    def is_stranger_result(self, label, confidence):
+        """Проверяет результат распознавания (label, confidence) на незнакомца"""
+        return label < 0 or confidence >= self.confidence_threshold
+    
+    def _prepare_batch(self, frame, boxes):
+        """
+        Готовит все лица кадра за один проход: кадр один раз переводится в grayscale,
+        а вырезанные лица масштабируются прямо в ячейки заранее выделенного буфера.
+        Возвращает (буфер, список флагов пригодности бокса)
+        """
+        count = len(boxes)
+        face_stack = getattr(self._local, 'face_stack', None)
+        if face_stack is None or face_stack.shape[0] < count:
+            face_stack = np.empty((max(count, 4), self.FACE_SIZE[1], self.FACE_SIZE[0]), dtype=np.uint8)
+            self._local.face_stack = face_stack
+        
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        frame_h, frame_w = gray.shape
+        
+        valid = []
+        for i, (x, y, w, h) in enumerate(boxes):
+            # Обрезаем бокс по границам кадра
+            x1, y1 = max(0, x), max(0, y)
+            x2, y2 = min(frame_w, x + w), min(frame_h, y + h)
+            if x2 <= x1 or y2 <= y1:
+                valid.append(False)
+                continue
+            cv2.resize(gray[y1:y2, x1:x2], self.FACE_SIZE, dst=face_stack[i])
+            valid.append(True)
+        
+        return face_stack[:count], valid
+    
+    def iter_identify(self, frame, boxes):
+        """
+        Распознает все лица кадра, выдавая (label, confidence) по одному.
+        Подготовка выполняется сразу для всех лиц, а predict - лениво,
+        поэтому вызывающий код может прервать перебор на первом незнакомце
+        """
+        # Все лица кадра распознаются одной моделью, даже если ее заменят во время кадра
+        model = self.model
+        if not model.names:
+            self.logger.warning("Модель не загружена - все лица считаются незнакомцами")
+            for _ in boxes:
+                yield -1, float('inf')
+            return
+        
+        if self.backend == 'embedding':
+            yield from self._identify_embeddings(model, frame, boxes)
+            return
+        
+        try:
+            start = time.perf_counter()
+            faces, valid = self._prepare_batch(frame, boxes)
+            if self.metrics is not None:
+                self.metrics.observe('recognize_prepare', time.perf_counter() - start)
+        except Exception as e:
+            self.logger.error(f"Ошибка подготовки лиц: {e}")
+            for _ in boxes:
+                yield -1, float('inf')
+            return
+        
+        for face, is_valid in zip(faces, valid):
+            if not is_valid:
+                yield -1, float('inf')
+                continue
+            try:
+                start = time.perf_counter()
+                label, confidence = model.predict(face)
+                if self.metrics is not None:
+                    self.metrics.observe('recognize', time.perf_counter() - start)
+                yield label, confidence
+            except Exception as e:
+                self.logger.error(f"Ошибка распознавания лица: {e}")
+                yield -1, float('inf')
+    
+    def _identify_embeddings(self, model, frame, boxes):
+        """
+        Эмбеддинги всех лиц кадра и одно векторизованное сравнение пакета со всей галереей.
+        Возвращает список (label, расстояние) в порядке boxes
+        """
+        frame_h, frame_w = frame.shape[:2]
+        results = [(-1, float('inf'))] * len(boxes)
+        
+        # Обрезаем боксы по границам кадра
+        clipped = []
+        indices = []
+        for i, (x, y, w, h) in enumerate(boxes):
+            x1, y1 = max(0, x), max(0, y)
+            x2, y2 = min(frame_w, x + w), min(frame_h, y + h)
+            if x2 > x1 and y2 > y1:
+                clipped.append((x1, y1, x2 - x1, y2 - y1))
+                indices.append(i)
+        if not clipped:
+            return results
+        
+        try:
+            start = time.perf_counter()
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            embeddings = compute_embeddings(rgb, clipped)
+            embedded = time.perf_counter()
+            labels, distances = model.gallery.match(embeddings)
+            if self.metrics is not None:
+                self.metrics.observe('recognize_prepare', embedded - start)
+                self.metrics.observe('recognize', time.perf_counter() - embedded)
+        except Exception as e:
+            self.logger.error(f"Ошибка распознавания лиц: {e}")
+            return results
+        
+        for i, label, distance in zip(indices, labels, distances):
+            results[i] = (int(label), float(distance))
+        return results
+    
+    def identify_batch(self, frame, boxes):
+        """
+        Распознает все лица кадра по их боксам (x, y, width, height)
+        Возвращает список (label, confidence) в порядке boxes; label = -1 если лицо не распознано
+        """
+        return list(self.iter_identify(frame, boxes))
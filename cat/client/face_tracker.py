@@ -0,0 +1,123 @@
+import time
+import logging
+
+
+def box_iou(box_a, box_b):
+    """Пересечение над объединением (IoU) двух боксов (x, y, width, height)"""
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+
+    inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+    inter_h = min(ay + ah, by + bh) - max(ay, by)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+
+    intersection = inter_w * inter_h
+    union = aw * ah + bw * bh - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+class FaceTrack:
+    """Одно лицо, отслеживаемое между кадрами, с кэшем результата распознавания"""
+
+    def __init__(self, track_id, box, clock=time.time):
+        self.track_id = track_id
+        self.box = box
+        self.clock = clock
+        self.created_at = clock()
+        self.last_seen = self.created_at
+        self.hits = 1
+        self.missed = 0
+
+        # Кэш распознавания: None - еще не проверяли
+        self.is_stranger = None
+        self.verified_at = None
+
+    def needs_recognition(self, reverify_interval):
+        """Нужно ли (пере)запустить распознавание для этого трека"""
+        if self.is_stranger is None:
+            return True
+        return self.clock() - self.verified_at >= reverify_interval
+
+    def set_verdict(self, is_stranger):
+        """Сохраняет результат распознавания"""
+        self.is_stranger = is_stranger
+        self.verified_at = self.clock()
+
+
+class FaceTracker:
+    """
+    Простой трекер нескольких лиц по IoU.
+    Связывает боксы текущего кадра с треками предыдущих кадров,
+    чтобы распознавание запускалось один раз на трек, а не на каждом кадре.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=5, clock=time.time):
+        self.logger = logging.getLogger(__name__)
+        self.clock = clock
+        # Минимальный IoU, чтобы считать бокс продолжением трека
+        self.iou_threshold = iou_threshold
+        # Сколько кадров подряд трек может не находиться, прежде чем удалить его
+        self.max_missed = max_missed
+
+        self.tracks = []
+        self._next_id = 1
+
+    def update(self, boxes):
+        """
+        Обновляет треки по боксам текущего кадра.
+        Возвращает список треков в том же порядке, что и boxes
+        """
+        now = self.clock()
+
+        # Жадное сопоставление по убыванию IoU
+        pairs = []
+        for box_index, box in enumerate(boxes):
+            for track_index, track in enumerate(self.tracks):
+                iou = box_iou(box, track.box)
+                if iou >= self.iou_threshold:
+                    pairs.append((iou, box_index, track_index))
+        pairs.sort(reverse=True)
+
+        assigned = [None] * len(boxes)
+        used_tracks = set()
+        for iou, box_index, track_index in pairs:
+            if assigned[box_index] is not None or track_index in used_tracks:
+                continue
+            track = self.tracks[track_index]
+            track.box = boxes[box_index]
+            track.last_seen = now
+            track.hits += 1
+            track.missed = 0
+            assigned[box_index] = track
+            used_tracks.add(track_index)
+
+        # Треки без пары стареют и удаляются
+        surviving = []
+        for track_index, track in enumerate(self.tracks):
+            if track_index not in used_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    self.logger.debug(f"👋 Трек #{track.track_id} потерян")
+                    continue
+            surviving.append(track)
+        self.tracks = surviving
+
+        # Новые лица получают новые треки
+        for box_index, box in enumerate(boxes):
+            if assigned[box_index] is None:
+                track = FaceTrack(self._next_id, box, clock=self.clock)
+                self._next_id += 1
+                self.tracks.append(track)
+                assigned[box_index] = track
+                self.logger.debug(f"🆕 Новый трек #{track.track_id}")
+
+        return assigned
+
+    def invalidate_verdicts(self):
+        """
+        Требует повторного распознавания всех треков (например после смены модели).
+        Вызывается из потока, который обрабатывает кадры канала
+        """
+        for track in list(self.tracks):
+            track.is_stranger = None
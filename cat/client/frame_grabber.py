@@ -0,0 +1,174 @@
+import cv2
+import time
+import logging
+import threading
+
+
+class FrameGrabber:
+    """
+    Захват кадров с камеры в отдельном потоке.
+    Хранит только самый свежий кадр - обработка забирает его в своем темпе,
+    а старые кадры не копятся в буфере драйвера.
+    """
+
+    def __init__(self, source=0, width=640, height=480, max_frame_age=1.0, metrics=None, frame_ring=None):
+        self.logger = logging.getLogger(__name__)
+        self.metrics = metrics
+        # Кольцо кадров в общей памяти (SharedFrameRing): кадр читается прямо в слот.
+        # Слот непрочитанного кадра принадлежит захвату, прочитанного - вызывающему read()
+        self.frame_ring = frame_ring
+        self.source = source
+        self.width = width
+        self.height = height
+        # Кадры старше этого возраста (сек) не отдаются на анализ
+        self.max_frame_age = max_frame_age
+
+        self.cap = None
+        self.is_running = False
+        self._thread = None
+
+        # Буфер на один кадр: (frame_id, timestamp, frame, slot)
+        self._latest = None
+        self._condition = threading.Condition()
+        self._last_read_id = 0
+
+        # Статистика
+        self.frames_captured = 0
+        self.frames_dropped = 0   # перезаписаны до того, как их забрали
+        self.frames_stale = 0     # слишком старые к моменту чтения
+        self.read_failures = 0
+        self.ring_fallbacks = 0   # кадр не поместился в слот кольца (другое разрешение)
+
+    def open(self):
+        """Открывает камеру. Возвращает True если камера доступна"""
+        self.cap = cv2.VideoCapture(self.source)
+
+        if not self.cap.isOpened():
+            self.logger.error(f"❌ Не удалось открыть источник кадров: {self.source}")
+            return False
+
+        # Устанавливаем разрешение
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        # Просим драйвер не копить кадры (поддерживается не всеми бэкендами)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self.logger.info(f"✅ Источник кадров подключен: {self.source}")
+        return True
+
+    def start(self):
+        """Запускает поток захвата"""
+        if self.cap is None and not self.open():
+            return False
+
+        self.is_running = True
+        self._thread = threading.Thread(target=self._capture_loop, name="FrameGrabber", daemon=True)
+        self._thread.start()
+        return True
+
+    def _capture_loop(self):
+        """Постоянно читает камеру и заменяет последний кадр"""
+        while self.is_running:
+            slot = None
+            if self.frame_ring is not None:
+                acquired = self.frame_ring.acquire(timeout=0.5)
+                if acquired is None:
+                    # Все слоты заняты конвейером - обратное давление: кадр драйвера выбрасываем
+                    if self.is_running:
+                        self.cap.grab()
+                    continue
+                slot, buffer = acquired
+
+            start = time.perf_counter()
+            if slot is None:
+                ret, frame = self.cap.read()
+            else:
+                ret, frame = self.cap.read(buffer)
+                if ret and frame is not buffer:
+                    # Размер кадра не совпал со слотом - OpenCV выделил новый массив
+                    self.ring_fallbacks += 1
+                    if self.ring_fallbacks == 1:
+                        self.logger.warning(f"⚠️ Кадр {frame.shape} не совпадает со слотом кольца, "
+                                            f"кадры передаются копированием")
+                if not ret or frame is not buffer:
+                    self.frame_ring.release(slot)
+                    slot = None
+            if self.metrics is not None:
+                self.metrics.observe('capture', time.perf_counter() - start)
+            if not ret:
+                self.read_failures += 1
+                if self.read_failures % 50 == 1:
+                    self.logger.warning("⚠️ Не удалось получить кадр с камеры")
+                time.sleep(0.1)
+                continue
+
+            with self._condition:
+                frame_id = self.frames_captured + 1
+                # Предыдущий кадр так и не был прочитан - считаем его потерянным
+                if self._latest is not None and self._latest[0] > self._last_read_id:
+                    self.frames_dropped += 1
+                    self._release_slot(self._latest[3])
+                self._latest = (frame_id, time.time(), frame, slot)
+                self.frames_captured = frame_id
+                self._condition.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        Возвращает самый свежий непрочитанный кадр: (frame_id, timestamp, frame)
+        Возвращает None если нового кадра нет за timeout секунд
+        С кольцом кадров вызывающий получает ссылку на слот кадра и сам ее отпускает
+        """
+        deadline = time.time() + timeout
+
+        with self._condition:
+            while self.is_running:
+                latest = self._latest
+                if latest is not None and latest[0] > self._last_read_id:
+                    self._last_read_id = latest[0]
+
+                    if time.time() - latest[1] > self.max_frame_age:
+                        self.frames_stale += 1
+                        self._release_slot(latest[3])
+                        continue
+                    return latest[:3]
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+        return None
+
+    def _release_slot(self, slot):
+        if slot is not None:
+            self.frame_ring.release(slot)
+
+    def get_stats(self):
+        """Статистика захвата"""
+        return {
+            'captured': self.frames_captured,
+            'dropped': self.frames_dropped,
+            'stale': self.frames_stale,
+            'read_failures': self.read_failures,
+            'ring_fallbacks': self.ring_fallbacks
+        }
+
+    def stop(self):
+        """Останавливает поток захвата и освобождает камеру"""
+        self.is_running = False
+        with self._condition:
+            self._condition.notify_all()
+
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+        with self._condition:
+            # Слот непрочитанного кадра возвращаем в кольцо
+            if self._latest is not None and self._latest[0] > self._last_read_id:
+                self._release_slot(self._latest[3])
+            self._latest = None
+
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
@@ -0,0 +1,85 @@
+import time
+import logging
+
+
+class FrameScheduler:
+    """
+    Планировщик частоты анализа кадров в зависимости от обстановки.
+
+    Режимы:
+    - alert: незнакомец в кадре или счетчик обнаружений растет - максимальная частота
+    - watch: в кадре есть лица - повышенная частота
+    - idle:  сцена пустая - интервал растет экспоненциально до максимума
+    """
+
+    IDLE = 'idle'
+    WATCH = 'watch'
+    ALERT = 'alert'
+
+    def __init__(self, alert_interval=0.1, watch_interval=0.25, idle_interval=0.5,
+                 idle_max_interval=2.0, idle_backoff=1.5, hold_time=5.0, clock=time.time):
+        self.logger = logging.getLogger(__name__)
+        self.clock = clock
+        self.alert_interval = alert_interval
+        self.watch_interval = watch_interval
+        self.idle_interval = idle_interval
+        self.idle_max_interval = idle_max_interval
+        self.idle_backoff = idle_backoff
+        # Сколько секунд удерживать повышенный режим после исчезновения лиц
+        self.hold_time = hold_time
+
+        self.mode = self.IDLE
+        self.interval = idle_interval
+        self._last_counter = 0
+        self._last_activity_time = 0.0
+        self._last_mode = self.IDLE
+
+    @classmethod
+    def from_config(cls, config, clock=time.time):
+        """Создает планировщик по настройкам из config.txt"""
+        if not config:
+            return cls(clock=clock)
+
+        return cls(
+            alert_interval=config.get_float('scheduler_alert_interval', 0.1),
+            watch_interval=config.get_float('scheduler_watch_interval', 0.25),
+            idle_interval=config.get_float('scheduler_idle_interval', 0.5),
+            idle_max_interval=config.get_float('scheduler_idle_max_interval', 2.0),
+            idle_backoff=config.get_float('scheduler_idle_backoff', 1.5),
+            hold_time=config.get_float('scheduler_hold_time', 5.0),
+            clock=clock
+        )
+
+    def update(self, faces_present, stranger_detected, detection_counter):
+        """Пересчитывает режим по результату обработки кадра"""
+        now = self.clock()
+        counter_rising = detection_counter > self._last_counter
+        self._last_counter = detection_counter
+
+        if stranger_detected or counter_rising:
+            self.mode = self.ALERT
+            self.interval = self.alert_interval
+            self._last_activity_time = now
+        elif faces_present:
+            self.mode = self.WATCH
+            self.interval = self.watch_interval
+            self._last_activity_time = now
+        elif now - self._last_activity_time < self.hold_time:
+            # Лица только что пропали - продолжаем в текущем режиме
+            pass
+        elif self.mode != self.IDLE:
+            self.mode = self.IDLE
+            self.interval = self.idle_interval
+        else:
+            # Пустая сцена - экспоненциальный откат
+            self.interval = min(self.interval * self.idle_backoff, self.idle_max_interval)
+
+        if self.mode != self._last_mode:
+            self.logger.debug(f"⏱️ Режим анализа: {self._last_mode} → {self.mode} ({self.interval:.2f}s)")
+            self._last_mode = self.mode
+
+        return self.mode
+
+    def next_delay(self, elapsed):
+        """Сколько ждать до следующего кадра с учетом времени обработки текущего"""
+        return max(0.0, self.interval - elapsed)
@@ -0,0 +1,193 @@
+import logging
+import numpy as np
+
+from .model_files import save_generation, load_generation
+
+# Индекс в known_faces_db/ (строится FaceTrainer вместе с галереей эмбеддингов):
+# заголовок и массивы текущего поколения ann_ivf_<часть>.g<N>.npy
+INDEX_HEADER = "ann_ivf_header.json"
+INDEX_ARRAYS = ('centroids', 'offsets', 'vectors', 'norms', 'labels')
+# Во сколько раз может вырасти галерея после k-means, прежде чем индекс строится заново
+REBUILD_GROWTH = 2.0
+
+
+def squared_distances(queries, vectors, vector_norms):
+    """Квадраты евклидовых расстояний (M, N) одним умножением матриц"""
+    distances = queries @ vectors.T
+    distances *= -2
+    distances += vector_norms
+    distances += np.einsum('ij,ij->i', queries, queries)[:, None]
+    return distances
+
+
+class GalleryIndex:
+    """
+    Приближенный поиск ближайшего соседа по галерее эмбеддингов (IVF).
+    Галерея разбита k-means на списки вокруг центроидов, векторы одного списка
+    лежат в файле подряд. Запрос сравнивается с центроидами, а затем только
+    с векторами nprobe ближайших списков - вместо всей галереи.
+    nprobe больше - выше полнота, но медленнее; nprobe = числу списков - точный поиск.
+    Векторы, нормы и метки открываются через memory-map и не читаются в память целиком.
+    built_samples - размер галереи, по которой считался k-means (дообучение добавляет
+    векторы к готовым спискам, пока галерея не вырастет в REBUILD_GROWTH раз).
+    """
+
+    def __init__(self, centroids, offsets, vectors, norms, labels, nprobe=8, built_samples=None):
+        self.logger = logging.getLogger(__name__)
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.vectors = vectors
+        self.norms = norms
+        self.labels = labels
+        self.nprobe = nprobe
+        self.built_samples = len(labels) if built_samples is None else built_samples
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def build(cls, embeddings, labels, nlist=None, iterations=10, seed=0):
+        """
+        Строит индекс k-means по эмбеддингам (N, 128)
+        nlist по умолчанию ~ sqrt(N) - баланс между сравнениями с центроидами и со списками
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        labels = np.asarray(labels, dtype=np.int32)
+        count = len(embeddings)
+        nlist = min(count, nlist or max(1, int(round(np.sqrt(count)))))
+
+        rng = np.random.default_rng(seed)
+        centroids = embeddings[rng.choice(count, nlist, replace=False)].copy()
+        norms = np.einsum('ij,ij->i', embeddings, embeddings)
+
+        for _ in range(iterations):
+            assignment = cls._assign(embeddings, centroids)
+            for index in range(nlist):
+                members = embeddings[assignment == index]
+                # Пустой список сохраняет прежний центроид
+                if len(members):
+                    centroids[index] = members.mean(axis=0)
+        assignment = cls._assign(embeddings, centroids)
+
+        # Векторы одного списка - подряд, offsets[i]:offsets[i+1] - границы списка i
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=offsets[1:])
+
+        return cls(centroids, offsets, embeddings[order], norms[order], labels[order])
+
+    def needs_rebuild(self, samples):
+        """Списки k-means устарели: галерея из samples образцов выросла слишком сильно"""
+        return samples > self.built_samples * REBUILD_GROWTH
+
+    def extend(self, embeddings, labels):
+        """
+        Новый индекс с добавленными эмбеддингами (N, 128): каждый вектор попадает
+        в список ближайшего из существующих центроидов, k-means не пересчитывается
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        labels = np.asarray(labels, dtype=np.int32)
+        norms = np.einsum('ij,ij->i', embeddings, embeddings)
+
+        # Номера списков: прежние векторы уже лежат по спискам, новые - по ближайшему центроиду
+        assignment = np.concatenate([
+            np.repeat(np.arange(self.nlist), np.diff(self.offsets)),
+            self._assign(embeddings, self.centroids)
+        ])
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=self.nlist), out=offsets[1:])
+
+        return GalleryIndex(
+            self.centroids, offsets,
+            np.concatenate([self.vectors, embeddings])[order],
+            np.concatenate([self.norms, norms])[order],
+            np.concatenate([self.labels, labels])[order],
+            nprobe=self.nprobe,
+            built_samples=self.built_samples
+        )
+
+    @staticmethod
+    def _assign(embeddings, centroids, chunk=8192):
+        """Номер ближайшего центроида для каждого эмбеддинга (порциями, чтобы не раздувать память)"""
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        assignment = np.empty(len(embeddings), dtype=np.int64)
+        for start in range(0, len(embeddings), chunk):
+            part = embeddings[start:start + chunk]
+            # |q|^2 одинаков для всех центроидов - для argmin не нужен
+            scores = centroid_norms - 2 * (part @ centroids.T)
+            assignment[start:start + chunk] = np.argmin(scores, axis=1)
+        return assignment
+
+    def save(self, db_path):
+        """Сохраняет индекс в db_path новым поколением файлов (открытый охраной индекс не трогается)"""
+        arrays = {
+            'ann_ivf_centroids': self.centroids,
+            'ann_ivf_offsets': self.offsets,
+            'ann_ivf_vectors': np.asarray(self.vectors, dtype=np.float32),
+            'ann_ivf_norms': np.asarray(self.norms, dtype=np.float32),
+            'ann_ivf_labels': np.asarray(self.labels, dtype=np.int32),
+        }
+        header = {'samples': len(self), 'nlist': self.nlist, 'built_samples': self.built_samples}
+        save_generation(db_path, INDEX_HEADER, arrays, header)
+
+    @classmethod
+    def load(cls, db_path, nprobe=8):
+        """
+        Открывает индекс из db_path через memory-map
+        Возвращает None если индекса нет
+        """
+        loaded = load_generation(db_path, INDEX_HEADER, [f"ann_ivf_{name}" for name in INDEX_ARRAYS])
+        if loaded is None:
+            return None
+        header, arrays = loaded
+
+        return cls(
+            centroids=np.array(arrays['ann_ivf_centroids']),
+            offsets=np.array(arrays['ann_ivf_offsets']),
+            vectors=arrays['ann_ivf_vectors'],
+            norms=arrays['ann_ivf_norms'],
+            labels=arrays['ann_ivf_labels'],
+            nprobe=nprobe,
+            built_samples=header.get('built_samples')
+        )
+
+    def search(self, queries):
+        """
+        Ближайший образец для каждого запроса (M, 128)
+        Возвращает (метки, евклидовы расстояния) - массивы длины M
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        count = len(queries)
+        best_labels = np.full(count, -1, dtype=np.int32)
+        best_distances = np.full(count, np.inf, dtype=np.float32)
+        if count == 0 or len(self) == 0:
+            return best_labels, best_distances
+
+        # Ближайшие списки для всех запросов сразу
+        nprobe = min(max(1, self.nprobe), self.nlist)
+        coarse = squared_distances(queries, self.centroids, self.centroid_norms)
+        if nprobe < self.nlist:
+            probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probes = np.broadcast_to(np.arange(self.nlist), (count, self.nlist))
+
+        for i in range(count):
+            query = queries[i:i + 1]
+            for list_index in probes[i]:
+                start, end = self.offsets[list_index], self.offsets[list_index + 1]
+                if start == end:
+                    continue
+                # Срез списка из memory-map - без копирования всей галереи
+                distances = squared_distances(query, self.vectors[start:end], self.norms[start:end])[0]
+                best = np.argmin(distances)
+                if distances[best] < best_distances[i]:
+                    best_distances[i] = distances[best]
+                    best_labels[i] = self.labels[start + best]
+
+        return best_labels, np.sqrt(np.maximum(best_distances, 0))
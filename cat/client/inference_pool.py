@@ -0,0 +1,104 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+
+class InferencePool:
+    """
+    Общий пул потоков инференса для всех камер.
+    У каждого потока свой детектор (граф MediaPipe нельзя использовать из разных потоков),
+    модель распознавания загружается один раз и общая для всех.
+    OpenCV и MediaPipe отпускают GIL во время вычислений, поэтому
+    загрузка процессора растет с числом потоков, а не с числом камер.
+    """
+
+    def __init__(self, detector_factory, workers=1, metrics=None):
+        self.logger = logging.getLogger(__name__)
+        self.workers = max(1, workers)
+        self.metrics = metrics
+
+        self._queue = queue.Queue()
+        # Детекторы создаются в потоках пула, параллельно с открытием камер
+        self._pending_detectors = self.workers
+        self._ready_lock = threading.Lock()
+        self._ready = threading.Event()
+        # Ошибка создания детектора - поднимается из wait_ready
+        self._error = None
+        self._threads = []
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker,
+                args=(detector_factory,),
+                name=f"Inference-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        self.logger.info(f"🧵 Пул инференса: {self.workers} поток(ов)")
+
+    def _worker(self, detector_factory):
+        """Поток инференса: создает свой детектор и выполняет задачи из очереди"""
+        detector = None
+        try:
+            detector = detector_factory()
+        except BaseException as e:
+            self.logger.error(f"❌ Не удалось создать детектор в потоке инференса: {e}")
+            self._error = e
+        finally:
+            with self._ready_lock:
+                self._pending_detectors -= 1
+                if self._pending_detectors == 0:
+                    self._ready.set()
+        if detector is None:
+            return
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            fn, args, future, submitted_at = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            if self.metrics is not None:
+                self.metrics.observe('inference_queue', time.perf_counter() - submitted_at)
+
+            try:
+                future.set_result(fn(detector, *args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def wait_ready(self, timeout=None):
+        """
+        Ждет создания детекторов во всех потоках. Возвращает True если пул готов
+        Если детектор не создан, поднимает его исключение
+        """
+        ready = self._ready.wait(timeout)
+        if self._error is not None:
+            raise self._error
+        return ready
+
+    def submit(self, fn, *args):
+        """
+        Ставит задачу в очередь: fn(detector, *args) выполнится на свободном потоке
+        Возвращает Future
+        """
+        future = Future()
+        self._queue.put((fn, args, future, time.perf_counter()))
+        return future
+
+    def run(self, fn, *args):
+        """Выполняет задачу на пуле и дожидается результата"""
+        return self.submit(fn, *args).result()
+
+    def close(self):
+        """Останавливает потоки пула"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
@@ -0,0 +1,167 @@
+import math
+import logging
+import numpy as np
+from pathlib import Path
+
+from .model_files import save_generation, load_generation
+
+# Бинарная модель LBPH в known_faces_db/ (вместо текстового face_model.yml):
+# заголовок и массивы текущего поколения lbph_histograms.g<N>.npy, lbph_labels.g<N>.npy
+HEADER_FILE = "lbph_header.json"
+HISTOGRAMS = "lbph_histograms"
+LABELS = "lbph_labels"
+FORMAT_VERSION = 1
+
+# Параметры LBPH по умолчанию из OpenCV (cv2.face.LBPHFaceRecognizer_create())
+RADIUS = 1
+NEIGHBORS = 8
+GRID_X = 8
+GRID_Y = 8
+PATTERNS = 2 ** NEIGHBORS
+HISTOGRAM_SIZE = GRID_X * GRID_Y * PATTERNS
+# Гистограмма каждой ячейки нормирована на 1
+HISTOGRAM_SUM = float(GRID_X * GRID_Y)
+
+
+def _sampling_weights():
+    """Смещения и веса билинейной интерполяции соседей - как в OpenCV elbp"""
+    weights = []
+    for n in range(NEIGHBORS):
+        x = np.float32(RADIUS * math.cos(2.0 * math.pi * n / float(NEIGHBORS)))
+        y = np.float32(-RADIUS * math.sin(2.0 * math.pi * n / float(NEIGHBORS)))
+        fx, fy = int(math.floor(x)), int(math.floor(y))
+        cx, cy = int(math.ceil(x)), int(math.ceil(y))
+        tx, ty = x - np.float32(fx), y - np.float32(fy)
+        one = np.float32(1)
+        weights.append((
+            (fy, fx, (one - tx) * (one - ty)),
+            (fy, cx, tx * (one - ty)),
+            (cy, fx, (one - tx) * ty),
+            (cy, cx, tx * ty),
+        ))
+    return weights
+
+
+_WEIGHTS = _sampling_weights()
+_EPSILON = np.finfo(np.float32).eps
+
+
+def lbp_histogram(face):
+    """
+    Пространственная гистограмма LBP лица (uint8, 2D) - та же, что строит OpenCV LBPH:
+    круговой LBP радиуса 1 по 8 соседям, сетка 8x8, нормированные гистограммы ячеек
+    Возвращает float32 (HISTOGRAM_SIZE,)
+    """
+    src = face.astype(np.float32)
+    h, w = face.shape
+    center = src[RADIUS:h - RADIUS, RADIUS:w - RADIUS]
+    codes = np.zeros(center.shape, dtype=np.int32)
+
+    for n, samples in enumerate(_WEIGHTS):
+        t = None
+        for dy, dx, weight in samples:
+            term = weight * src[RADIUS + dy:h - RADIUS + dy, RADIUS + dx:w - RADIUS + dx]
+            t = term if t is None else t + term
+        codes |= ((t > center) | (np.abs(t - center) < _EPSILON)).astype(np.int32) << n
+
+    # Ячейки сетки (остаток справа и снизу не учитывается, как в OpenCV)
+    cell_h, cell_w = codes.shape[0] // GRID_Y, codes.shape[1] // GRID_X
+    cells = codes[:cell_h * GRID_Y, :cell_w * GRID_X].reshape(GRID_Y, cell_h, GRID_X, cell_w)
+    cells = cells.transpose(0, 2, 1, 3).reshape(GRID_Y * GRID_X, cell_h * cell_w)
+    cells = cells + (np.arange(GRID_Y * GRID_X, dtype=np.int32) * PATTERNS)[:, None]
+
+    counts = np.bincount(cells.ravel(), minlength=GRID_Y * GRID_X * PATTERNS).astype(np.float32)
+    return counts / np.float32(cell_h * cell_w)
+
+
+class LBPHStore:
+    """
+    Модель LBPH в компактном бинарном виде: гистограммы всех образцов -
+    одна матрица float32 (N, 16384) в .npy, открываемая через memory-map,
+    метки - int32 (N,), параметры - маленький JSON-заголовок.
+    Каждое обучение пишет новое поколение файлов, поэтому открытая охраной модель
+    не перезаписывается (на Windows отображенный в память файл заменить нельзя).
+    Загрузка не зависит от размера галереи, а предсказание совпадает с OpenCV
+    (ближайший образец по хи-квадрату HISTCMP_CHISQR_ALT)
+    """
+
+    # Сколько образцов сравнивается за один проход (ограничивает временные буферы)
+    CHUNK = 1024
+
+    def __init__(self, histograms, labels):
+        self.logger = logging.getLogger(__name__)
+        self.histograms = histograms
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.labels)
+
+    @staticmethod
+    def exists(db_path):
+        # Заголовок пишется последним - если он есть, файлы поколения уже записаны
+        return (Path(db_path) / HEADER_FILE).exists()
+
+    @classmethod
+    def load(cls, db_path):
+        """Открывает модель из db_path. Гистограммы не читаются в память целиком"""
+        loaded = load_generation(db_path, HEADER_FILE, (HISTOGRAMS, LABELS))
+        if loaded is None:
+            raise FileNotFoundError(f"Бинарная модель LBPH не найдена в {db_path}")
+        header, arrays = loaded
+
+        params = (header.get('radius'), header.get('neighbors'), header.get('grid_x'), header.get('grid_y'))
+        if header.get('version') != FORMAT_VERSION or params != (RADIUS, NEIGHBORS, GRID_X, GRID_Y):
+            raise ValueError(f"Неподдерживаемая бинарная модель LBPH: {header}")
+
+        histograms, labels = arrays[HISTOGRAMS], arrays[LABELS]
+        if histograms.shape != (header['samples'], HISTOGRAM_SIZE) or len(labels) != header['samples']:
+            raise ValueError("Бинарная модель LBPH повреждена: размеры не совпадают с заголовком")
+        return cls(histograms, labels)
+
+    @staticmethod
+    def save(db_path, histograms, labels):
+        """Сохраняет модель в db_path: гистограммы (N, 16384) и метки (N,)"""
+        histograms = np.ascontiguousarray(histograms, dtype=np.float32).reshape(-1, HISTOGRAM_SIZE)
+        labels = np.asarray(labels, dtype=np.int32).ravel()
+
+        header = {
+            'version': FORMAT_VERSION,
+            'radius': RADIUS,
+            'neighbors': NEIGHBORS,
+            'grid_x': GRID_X,
+            'grid_y': GRID_Y,
+            'samples': len(labels),
+            'histogram_size': histograms.shape[1]
+        }
+        # Заголовок пишется последним: по нему модель считается готовой
+        save_generation(db_path, HEADER_FILE, {HISTOGRAMS: histograms, LABELS: labels}, header)
+
+    def predict(self, face):
+        """Распознает лицо (uint8 100x100). Возвращает (label, confidence) как LBPH predict"""
+        if len(self) == 0:
+            return -1, float('inf')
+
+        # Хи-квадрат sum((h - q)^2 / (h + q)) считается только по ненулевым бинам запроса:
+        # где q = 0, слагаемое равно h, а сумма каждой гистограммы известна заранее
+        # (по 1 на ячейку сетки) - это в несколько раз меньше данных, чем полная матрица
+        query = lbp_histogram(face)
+        nonzero = np.flatnonzero(query)
+        q = query[nonzero]
+        best_label, best_distance = -1, float('inf')
+
+        for start in range(0, len(self), self.CHUNK):
+            h = self.histograms[start:start + self.CHUNK, nonzero]
+            total = h + q
+            diff = h - q
+            np.square(diff, out=diff)
+            np.divide(diff, total, out=diff)
+            distances = diff.sum(axis=1, dtype=np.float64)
+            distances += HISTOGRAM_SUM - h.sum(axis=1, dtype=np.float64)
+            distances *= 2
+
+            index = int(np.argmin(distances))
+            if distances[index] < best_distance:
+                best_distance = float(distances[index])
+                best_label = int(self.labels[start + index])
+
+        return best_label, max(best_distance, 0.0)
@@ -0,0 +1,198 @@
+import os
+import time
+import logging
+import threading
+from array import array
+from pathlib import Path
+from contextlib import contextmanager
+
+
+class StageStats:
+    """
+    Задержки одного этапа конвейера.
+    Хранит последние N замеров в заранее выделенном кольцевом буфере -
+    запись замера не выделяет память, перцентили считаются только при выгрузке
+    """
+
+    def __init__(self, capacity=1024):
+        self._samples = array('d', bytes(8 * capacity))
+        self._capacity = capacity
+        self._index = 0
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        """Добавляет замер (в секундах)"""
+        with self._lock:
+            self._samples[self._index] = seconds
+            self._index = (self._index + 1) % self._capacity
+            self.count += 1
+            self.total += seconds
+
+    def quantiles(self, qs=(0.5, 0.95, 0.99)):
+        """Перцентили по последним замерам"""
+        with self._lock:
+            filled = min(self.count, self._capacity)
+            samples = sorted(self._samples[:filled])
+        if not samples:
+            return {q: 0.0 for q in qs}
+        return {q: samples[min(filled - 1, int(q * filled))] for q in qs}
+
+
+class PipelineMetrics:
+    """
+    Метрики конвейера охраны: задержки этапов (p50/p95/p99), fps и счетчики.
+    Периодически записываются в локальный файл в текстовом формате Prometheus
+    """
+
+    PREFIX = "blackcat"
+
+    def __init__(self, metrics_file="metrics.prom", interval=15.0, enabled=True):
+        self.logger = logging.getLogger(__name__)
+        self.metrics_file = Path(metrics_file)
+        self.interval = interval
+        self.enabled = enabled
+
+        self.stages = {}
+        self.counters = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+        self._last_export_time = time.time()
+        self._last_frames = 0
+        self.fps = 0.0
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _stage(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self.stages.setdefault(name, StageStats())
+        return stats
+
+    def observe(self, stage, seconds):
+        """Записывает длительность этапа (в секундах)"""
+        if self.enabled:
+            self._stage(stage).observe(seconds)
+
+    @contextmanager
+    def time_stage(self, stage):
+        """Контекстный менеджер для замера этапа: with metrics.time_stage('detect'): ..."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stage(stage).observe(time.perf_counter() - start)
+
+    def inc(self, name, value=1):
+        """Увеличивает счетчик"""
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    @staticmethod
+    def labeled(name, **labels):
+        """Ключ метрики с метками для словаря collector(): labeled('camera_open_seconds', camera='cam0')"""
+        return name, tuple(sorted(labels.items()))
+
+    def add_collector(self, collector, labels=None):
+        """
+        Добавляет источник метрик, который опрашивается только при выгрузке
+        collector() возвращает словарь {имя метрики или labeled(...): значение}
+        labels - метки для всех метрик источника, например {'camera': 'cam0'}
+        """
+        self._collectors.append((collector, tuple(sorted((labels or {}).items()))))
+
+    def snapshot(self):
+        """Текущие значения всех метрик в виде словаря"""
+        now = time.time()
+        frames = self.counters.get('frames_processed', 0)
+        elapsed = now - self._last_export_time
+        if elapsed > 0:
+            self.fps = (frames - self._last_frames) / elapsed
+        self._last_export_time = now
+        self._last_frames = frames
+
+        # Ключ gauge - (имя, метки); метки - кортеж пар (имя, значение)
+        gauges = {('fps', ()): self.fps}
+        for collector, labels in self._collectors:
+            try:
+                for key, value in collector().items():
+                    name, key_labels = key if isinstance(key, tuple) else (key, ())
+                    gauges[(name, tuple(sorted(labels + key_labels)))] = value
+            except Exception as e:
+                self.logger.debug(f"Ошибка сбора метрик: {e}")
+
+        with self._lock:
+            counters = dict(self.counters)
+        stages = {
+            name: (stats.quantiles(), stats.total, stats.count)
+            for name, stats in list(self.stages.items())
+        }
+        return {'stages': stages, 'counters': counters, 'gauges': gauges}
+
+    def render_prometheus(self, snapshot=None):
+        """Форматирует метрики в текстовом формате Prometheus"""
+        snapshot = snapshot or self.snapshot()
+        p = self.PREFIX
+        lines = [
+            f"# HELP {p}_stage_latency_seconds Задержка этапа конвейера",
+            f"# TYPE {p}_stage_latency_seconds summary",
+        ]
+        for stage, (quantiles, total, count) in sorted(snapshot['stages'].items()):
+            for q, value in quantiles.items():
+                lines.append(f'{p}_stage_latency_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'{p}_stage_latency_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{p}_stage_latency_seconds_count{{stage="{stage}"}} {count}')
+
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            lines.append(f"{p}_{name}_total {value}")
+
+        # Одна строка TYPE на имя - значения с разными метками идут под ней
+        previous = None
+        for (name, labels), value in sorted(snapshot['gauges'].items()):
+            if name != previous:
+                lines.append(f"# TYPE {p}_{name} gauge")
+                previous = name
+            label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+            lines.append(f"{p}_{name}{{{label_text}}} {value:g}" if labels else f"{p}_{name} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """Записывает метрики в файл (атомарно, через временный файл)"""
+        try:
+            tmp_path = self.metrics_file.with_suffix(self.metrics_file.suffix + ".tmp")
+            tmp_path.write_text(self.render_prometheus(), encoding='utf-8')
+            os.replace(tmp_path, self.metrics_file)
+        except Exception as e:
+            self.logger.error(f"❌ Ошибка записи метрик: {e}")
+
+    def _export_loop(self):
+        while not self._stop_event.wait(self.interval):
+            self.export()
+
+    def start(self):
+        """Запускает периодическую запись метрик"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._export_loop, name="MetricsExporter", daemon=True)
+        self._thread.start()
+        self.logger.info(f"📈 Метрики пишутся в {self.metrics_file} каждые {self.interval:g} сек")
+
+    def stop(self):
+        """Останавливает запись метрик (с финальной выгрузкой)"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=2)
+        self._thread = None
+        self.export()
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import numpy as np
+from pathlib import Path
+
+# Сколько раз повторять замену файла, пока его держит открытым другой процесс (Windows)
+REPLACE_RETRIES = 20
+REPLACE_DELAY = 0.05
+
+
+def _replace(tmp_path, path):
+    """
+    os.replace с повторами: на Windows файл нельзя заменить, пока другой процесс
+    держит его открытым (охрана как раз читает JSON-заголовок)
+    """
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            os.replace(tmp_path, path)
+            return
+        except PermissionError:
+            if attempt == REPLACE_RETRIES - 1:
+                raise
+            time.sleep(REPLACE_DELAY)
+
+
+def save_array(path, array):
+    """Сохраняет массив в .npy атомарно: запись во временный файл и замена"""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    _replace(tmp_path, path)
+
+
+def save_json(path, data, indent=2):
+    """Сохраняет JSON атомарно"""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+    _replace(tmp_path, path)
+
+
+def save_generation(db_path, header_name, arrays, header):
+    """
+    Сохраняет новое поколение массивов модели.
+    Каждый массив пишется в новый файл <имя>.g<поколение>.npy, затем заголовок
+    header_name (последним) с номером поколения и именами файлов.
+    Файлы, которые охрана открыла через memory-map, никогда не перезаписываются:
+    на Windows такой файл нельзя ни заменить, ни удалить. Охрана читает старое
+    поколение, пока не перезагрузит модель по новому заголовку.
+    arrays - {имя: массив}. Возвращает номер поколения
+    """
+    db_path = Path(db_path)
+    previous = read_header(db_path / header_name) or {}
+    generation = int(previous.get('generation', 0)) + 1
+
+    files = {}
+    for name, array in arrays.items():
+        filename = f"{name}.g{generation}.npy"
+        save_array(db_path / filename, array)
+        files[name] = filename
+
+    save_json(db_path / header_name, dict(header, generation=generation, files=files))
+
+    # Прежние поколения: удаляем все, что уже не открыто (остальные - при следующем сохранении)
+    for name, filename in files.items():
+        for path in [db_path / f"{name}.npy", *db_path.glob(f"{name}.g*.npy")]:
+            if path.name != filename and path.exists():
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+    return generation
+
+
+def read_header(path):
+    """JSON-заголовок модели или None если его нет"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_generation(db_path, header_name, names, mmap=True):
+    """
+    Открывает массивы текущего поколения по заголовку header_name
+    Возвращает (заголовок, {имя: массив}) или None если модели нет.
+    mmap=True - массивы открываются через memory-map и не читаются в память целиком
+    """
+    db_path = Path(db_path)
+    header = read_header(db_path / header_name)
+    if header is None:
+        return None
+
+    files = header.get('files', {})
+    arrays = {
+        name: np.load(db_path / files.get(name, f"{name}.npy"), mmap_mode='r' if mmap else None)
+        for name in names
+    }
+    return header, arrays
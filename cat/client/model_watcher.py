@@ -0,0 +1,111 @@
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+
+
+class ModelWatcher:
+    """
+    Следит за папкой модели (known_faces_db/) и вызывает on_change после переобучения.
+    Папка опрашивается раз в interval секунд: сравниваются размеры и время изменения файлов.
+    Обучение пишет несколько файлов подряд, поэтому on_change вызывается только
+    когда файлы не менялись debounce секунд. Вызов идет в потоке наблюдателя -
+    мониторинг в это время продолжает работать на прежней модели
+    """
+
+    def __init__(self, db_path, on_change, interval=2.0, debounce=1.0):
+        self.logger = logging.getLogger(__name__)
+        self.db_path = Path(db_path)
+        self.on_change = on_change
+        self.interval = interval
+        self.debounce = debounce
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        # Состояние файлов загруженной модели
+        self._loaded = None
+
+        # Статистика
+        self.changes_detected = 0
+        self.reloads = 0
+        self.reload_failures = 0
+
+    def _signature(self):
+        """Размер и время изменения файлов модели (временные файлы атомарной записи не учитываются)"""
+        try:
+            with os.scandir(self.db_path) as entries:
+                return frozenset(
+                    (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+                    for entry in entries
+                    if entry.is_file() and not entry.name.endswith('.tmp')
+                )
+        except OSError:
+            return frozenset()
+
+    def mark_loaded(self):
+        """
+        Запоминает состояние файлов как загруженное. Вызывается перед загрузкой модели,
+        чтобы переобучение, закончившееся до запуска наблюдения, не было пропущено
+        """
+        self._loaded = self._signature()
+
+    def _watch_loop(self):
+        if self._loaded is None:
+            self.mark_loaded()
+        pending = None
+        changed_at = 0.0
+
+        while not self._stop_event.wait(self.interval):
+            signature = self._signature()
+            if signature == self._loaded:
+                pending = None
+                continue
+
+            # Ждем, пока обучение допишет все файлы
+            if signature != pending:
+                if pending is None:
+                    self.changes_detected += 1
+                    self.logger.info(f"🔄 Модель в {self.db_path} изменилась, ожидаем окончания записи...")
+                pending = signature
+                changed_at = time.time()
+                continue
+            if time.time() - changed_at < self.debounce:
+                continue
+
+            # Неудачная загрузка не повторяется, пока файлы снова не изменятся
+            self._loaded, pending = signature, None
+            try:
+                ok = self.on_change()
+            except Exception as e:
+                self.logger.error(f"❌ Ошибка перезагрузки модели: {e}")
+                ok = False
+            if ok:
+                self.reloads += 1
+            else:
+                self.reload_failures += 1
+
+    def start(self):
+        """Запускает наблюдение"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch_loop, name="ModelWatcher", daemon=True)
+        self._thread.start()
+        self.logger.info(f"👀 Перезагрузка модели: проверка {self.db_path} каждые {self.interval:g} сек")
+
+    def stop(self):
+        """Останавливает наблюдение"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=self.interval + 5)
+        self._thread = None
+
+    def get_stats(self):
+        """Статистика перезагрузок"""
+        return {
+            'changes_detected': self.changes_detected,
+            'reloads': self.reloads,
+            'reload_failures': self.reload_failures
+        }
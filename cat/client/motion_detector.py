@@ -0,0 +1,84 @@
+import cv2
+import time
+import logging
+
+
+class MotionDetector:
+    """
+    Дешевый фильтр движения перед детектором лиц.
+    Сравнивает уменьшенный серый кадр с фоновой моделью (скользящее среднее)
+    и пропускает кадр дальше только если сцена изменилась
+    или пришло время периодической проверки (keep-alive).
+    """
+
+    def __init__(self, width=64, pixel_threshold=25, area_threshold=0.01,
+                 background_alpha=0.05, keepalive_interval=10.0, clock=time.time):
+        self.logger = logging.getLogger(__name__)
+        self.clock = clock
+        # Ширина уменьшенного кадра для сравнения
+        self.width = width
+        # Минимальная разница яркости пикселя, считающаяся изменением
+        self.pixel_threshold = pixel_threshold
+        # Доля измененных пикселей, при которой считаем, что есть движение
+        self.area_threshold = area_threshold
+        # Скорость подстройки фона под медленные изменения (освещение)
+        self.background_alpha = background_alpha
+        # Максимальный интервал (сек) между полными проверками детектором
+        self.keepalive_interval = keepalive_interval
+
+        self._background = None
+        self._last_pass_time = 0.0
+
+        # Статистика
+        self.frames_checked = 0
+        self.frames_passed = 0
+
+    def _prepare(self, frame):
+        """Уменьшает кадр и переводит в grayscale"""
+        h, w = frame.shape[:2]
+        height = max(1, int(h * self.width / w))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def has_motion(self, frame):
+        """
+        Возвращает True если кадр нужно отдать детектору лиц:
+        сцена изменилась или истек интервал keep-alive
+        """
+        self.frames_checked += 1
+        gray = self._prepare(frame)
+        now = self.clock()
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype("float32")
+            self._last_pass_time = now
+            self.frames_passed += 1
+            return True
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        changed = cv2.countNonZero(cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)[1])
+        changed_ratio = changed / diff.size
+
+        # Фон медленно подстраивается под текущую сцену
+        cv2.accumulateWeighted(gray, self._background, self.background_alpha)
+
+        motion = changed_ratio >= self.area_threshold
+        keepalive = now - self._last_pass_time >= self.keepalive_interval
+
+        if motion or keepalive:
+            if keepalive and not motion:
+                self.logger.debug("⏰ Плановая проверка кадра детектором (keep-alive)")
+            self._last_pass_time = now
+            self.frames_passed += 1
+            return True
+
+        return False
+
+    def get_stats(self):
+        """Статистика фильтра"""
+        return {
+            'checked': self.frames_checked,
+            'passed': self.frames_passed,
+            'skipped': self.frames_checked - self.frames_passed
+        }
@@ -0,0 +1,188 @@
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from .shared_frames import attach_frame
+
+# Модели процесса-воркера: загружаются один раз при старте процесса
+_detector = None
+_recognizer = None
+# Версия модели главного процесса, с которой совпадает модель воркера
+_model_version = 0
+# Заранее загруженные модели {версия: FaceModel}, ждущие переключения
+_pending_models = {}
+# Общий барьер пула: каждый воркер получает ровно одну задачу предзагрузки
+_barrier = None
+
+
+def _init_worker(detector_options, recognizer_options, log_level, barrier):
+    """Инициализация процесса-воркера: загрузка детектора и модели распознавания"""
+    global _detector, _recognizer, _barrier
+    _barrier = barrier
+    from .face_detector import FaceDetector
+    from .face_recognizer import FaceRecognizer
+
+    logging.basicConfig(level=log_level, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    _detector = FaceDetector(**detector_options)
+    _recognizer = FaceRecognizer(**recognizer_options)
+
+
+def _resolve_frame(frame):
+    """Кадр целиком или описание слота в общей памяти (имя, смещение, форма)"""
+    return attach_frame(frame) if isinstance(frame, tuple) else frame
+
+
+def _detect(frame):
+    return _detector.detect_faces(_resolve_frame(frame))
+
+
+def _identify(frame, boxes, model_version=0):
+    global _model_version
+    if model_version != _model_version:
+        # Первая задача с новой версией переключает заранее загруженную модель.
+        # Загрузка здесь - только если воркер пропустил предзагрузку
+        model = _pending_models.pop(model_version, None) or _recognizer.load_model()
+        if model is not None:
+            _recognizer.set_model(model)
+        _model_version = model_version
+        _pending_models.clear()
+    return _recognizer.identify_batch(_resolve_frame(frame), boxes)
+
+
+def _preload_model(model_version, timeout):
+    """
+    Загружает новую модель, не переключая текущую, и ждет на барьере остальные воркеры -
+    так задача достается каждому процессу ровно один раз
+    """
+    model = _recognizer.load_model()
+    _pending_models.clear()
+    if model is not None:
+        _pending_models[model_version] = model
+    try:
+        _barrier.wait(timeout)
+    except threading.BrokenBarrierError:
+        return False
+    return model is not None
+
+
+def _ping():
+    return True
+
+
+class ProcessInferencePool:
+    """
+    Детекция и распознавание в пуле процессов - обход GIL на многоядерных машинах.
+    Каждый процесс один раз загружает детектор и модель распознавания.
+    Порядок результатов сохраняется вызывающим кодом: задачи возвращают Future,
+    которые забираются в порядке отправки кадров.
+    Кадры из кольца в общей памяти (frame_ring) передаются процессу описанием слота,
+    остальные - копированием через pickle. Пока задача в процессе, пул держит
+    свою ссылку на слот, и слот не уходит под новый кадр до завершения задачи
+    """
+
+    def __init__(self, workers=2, detector_options=None, recognizer_options=None, metrics=None):
+        self.logger = logging.getLogger(__name__)
+        self.workers = max(1, workers)
+        self.metrics = metrics
+        # Увеличивается при перезагрузке модели; воркеры сверяют ее перед распознаванием
+        self.model_version = 0
+
+        # spawn - одинаковое поведение на Windows и Linux (без fork потоков MediaPipe)
+        context = multiprocessing.get_context('spawn')
+        self._barrier = context.Barrier(self.workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(detector_options or {}, recognizer_options or {}, logging.getLogger().getEffectiveLevel(),
+                      self._barrier)
+        )
+
+        # Запускаем все процессы заранее, чтобы загрузка моделей не пришлась на первый кадр.
+        # Не ждем здесь: процессы загружают модели, пока открываются камеры (см. wait_ready)
+        self._warmup = [self._executor.submit(_ping) for _ in range(self.workers)]
+
+        self.logger.info(f"🧩 Пул процессов инференса: {self.workers} процесс(ов)")
+
+    def wait_ready(self, timeout=None):
+        """Ждет запуска процессов и загрузки в них моделей. Возвращает True если пул готов"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for future in self._warmup:
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            try:
+                future.result(timeout=remaining)
+            except FutureTimeoutError:
+                return False
+        return True
+
+    def _submit(self, fn, frame, frame_ring, *args):
+        """Отправляет задачу с кадром: слот кольца удерживается до завершения задачи"""
+        descriptor = frame_ring.descriptor(frame) if frame_ring is not None else None
+        if descriptor is None:
+            return self._executor.submit(fn, frame, *args)
+
+        slot = frame_ring.slot_of(frame)
+        frame_ring.retain(slot)
+        try:
+            future = self._executor.submit(fn, descriptor, *args)
+        except BaseException:
+            frame_ring.release(slot)
+            raise
+        future.add_done_callback(lambda _: frame_ring.release(slot))
+        return future
+
+    def submit_detect(self, frame, frame_ring=None):
+        """Ставит детекцию кадра в очередь. Возвращает Future со списком боксов"""
+        return self._submit(_detect, frame, frame_ring)
+
+    def detect(self, frame, frame_ring=None):
+        """Детекция лиц в процессе-воркере"""
+        start = time.perf_counter()
+        faces = self.submit_detect(frame, frame_ring).result()
+        if self.metrics is not None:
+            self.metrics.observe('detect_remote', time.perf_counter() - start)
+        return faces
+
+    def identify(self, frame, boxes, frame_ring=None):
+        """Распознавание всех лиц кадра в процессе-воркере: список (label, confidence)"""
+        if not boxes:
+            return []
+        start = time.perf_counter()
+        results = self._submit(_identify, frame, frame_ring, boxes, self.model_version).result()
+        if self.metrics is not None:
+            self.metrics.observe('recognize_remote', time.perf_counter() - start)
+        return results
+
+    def preload_model(self, timeout=60.0):
+        """
+        Загружает новую модель распознавания во все воркеры, не переключая ее.
+        Задачу нельзя отправить конкретному процессу, поэтому отправляется по задаче
+        на воркер, и каждая ждет на общем барьере. Пока воркеры загружают модель,
+        задачи кадров ждут в очереди (бинарная модель загружается за миллисекунды).
+        Возвращает номер версии для activate_model или None при ошибке
+        """
+        version = self.model_version + 1
+        futures = [self._executor.submit(_preload_model, version, timeout) for _ in range(self.workers)]
+        try:
+            ok = all([future.result(timeout=timeout + 5) for future in futures])
+        except Exception as e:
+            self.logger.error(f"❌ Ошибка загрузки модели в процессах инференса: {e}")
+            ok = False
+        if not ok:
+            self._barrier.reset()
+            return None
+        return version
+
+    def activate_model(self, version):
+        """
+        Переключает воркеры на модель, загруженную preload_model.
+        Версия передается с каждой задачей распознавания, поэтому кадр распознается
+        той моделью, которая была текущей в главном процессе при отправке
+        """
+        self.model_version = version
+
+    def close(self):
+        """Останавливает процессы пула"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,155 @@
+import time
+import logging
+from collections import deque
+
+
+class RateWindow:
+    """Скользящее окно: количество обнаружений за последние seconds секунд"""
+
+    def __init__(self, seconds, threshold):
+        self.seconds = seconds
+        self.threshold = threshold
+        self._timestamps = deque()
+
+    def add(self, timestamp):
+        """Добавляет обнаружение (амортизированно O(1))"""
+        self._timestamps.append(timestamp)
+
+    def expire(self, now):
+        """Удаляет обнаружения старше окна"""
+        border = now - self.seconds
+        while self._timestamps and self._timestamps[0] < border:
+            self._timestamps.popleft()
+
+    @property
+    def count(self):
+        return len(self._timestamps)
+
+    def __repr__(self):
+        return f"{self.count}/{self.threshold} за {self.seconds:g}s"
+
+
+class DetectionRateEngine:
+    """
+    Решение об уведомлении по частоте обнаружений незнакомца.
+
+    Поддерживает несколько окон (например, быстрое 10 с и медленное 5 мин):
+    уведомление срабатывает, когда любое окно достигает своего порога.
+    После срабатывания движок разоружается и снова взводится только когда
+    все окна опустятся ниже rearm_ratio * порог (гистерезис)
+    и пройдет cooldown секунд с последнего уведомления.
+
+    Обнаружения считаются по времени, а не по кадрам: не чаще одного за count_interval
+    секунд. Иначе в режиме тревоги (10 кадров/сек) порог достигался бы в разы быстрее,
+    чем при исходном цикле с паузой 0.5 сек, на который рассчитаны пороги.
+    """
+
+    def __init__(self, windows, rearm_ratio=0.5, cooldown=60.0, count_interval=0.5, clock=time.time):
+        self.logger = logging.getLogger(__name__)
+        self.clock = clock
+        # Список RateWindow; первое окно - основное (его счетчик показывается пользователю)
+        self.windows = [RateWindow(seconds, threshold) for seconds, threshold in windows]
+        self.rearm_ratio = rearm_ratio
+        self.cooldown = cooldown
+        self.count_interval = count_interval
+
+        self.armed = True
+        self.last_count_time = None
+        self.last_alert_time = None
+        # Окно, сработавшее при последнем уведомлении (для текста уведомления)
+        self.triggered_window = None
+
+    @staticmethod
+    def parse_windows(value):
+        """Разбирает строку окон из config.txt: "10:8,300:60" -> [(10.0, 8), (300.0, 60)]"""
+        windows = []
+        for item in value.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            seconds, threshold = item.split(':')
+            windows.append((float(seconds), int(threshold)))
+        return windows
+
+    @classmethod
+    def from_config(cls, config, alert_time_window=60, alert_threshold=20, clock=time.time):
+        """
+        Создает движок по настройкам из config.txt.
+        Основное окно - alert_time_window/alert_threshold, дополнительные - alert_extra_windows
+        """
+        windows = [(float(alert_time_window), alert_threshold)]
+        rearm_ratio = 0.5
+        cooldown = 60.0
+        count_interval = 0.5
+
+        if config:
+            try:
+                windows += cls.parse_windows(config.get('alert_extra_windows', ''))
+            except ValueError:
+                logging.getLogger(__name__).error("❌ Неверный формат alert_extra_windows (ожидается сек:порог,...)")
+            rearm_ratio = config.get_float('alert_rearm_ratio', rearm_ratio)
+            cooldown = config.get_float('alert_cooldown', cooldown)
+            count_interval = config.get_float('alert_count_interval', count_interval)
+
+        return cls(windows, rearm_ratio=rearm_ratio, cooldown=cooldown, count_interval=count_interval,
+                   clock=clock)
+
+    @property
+    def count(self):
+        """Счетчик основного окна"""
+        return self.windows[0].count
+
+    def _expire(self, now):
+        for window in self.windows:
+            window.expire(now)
+
+    def _try_rearm(self, now):
+        """Взводит движок, если все окна ниже порога гистерезиса и прошел cooldown"""
+        if self.armed:
+            return
+        if self.last_alert_time is not None and now - self.last_alert_time < self.cooldown:
+            return
+        if all(window.count <= window.threshold * self.rearm_ratio for window in self.windows):
+            self.armed = True
+            self.logger.debug("🔄 Уведомления снова взведены (обнаружения ниже порога гистерезиса)")
+
+    def record(self, now=None):
+        """
+        Регистрирует обнаружение незнакомца (не чаще одного за count_interval секунд)
+        Возвращает True если нужно отправить уведомление; сработавшее окно - в triggered_window
+        """
+        now = self.clock() if now is None else now
+        if self.last_count_time is not None and now - self.last_count_time < self.count_interval:
+            self.tick(now)
+            return False
+        self.last_count_time = now
+        for window in self.windows:
+            window.add(now)
+        self._expire(now)
+        self._try_rearm(now)
+
+        if not self.armed:
+            return False
+        triggered = next((window for window in self.windows if window.count >= window.threshold), None)
+        if triggered is None:
+            return False
+        self.armed = False
+        self.last_alert_time = now
+        self.triggered_window = triggered
+        return True
+
+    def tick(self, now=None):
+        """Обновляет окна без обнаружения (кадр без незнакомца)"""
+        now = self.clock() if now is None else now
+        self._expire(now)
+        self._try_rearm(now)
+
+    def rearm(self):
+        """Принудительно взводит движок (например, если уведомление не удалось поставить в очередь)"""
+        self.armed = True
+        self.last_alert_time = None
+
+    def disarm(self):
+        """Принудительно разоружает движок"""
+        self.armed = False
+        self.last_alert_time = self.clock()
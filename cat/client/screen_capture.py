@@ -0,0 +1,99 @@
+import cv2
+import time
+import logging
+import threading
+import numpy as np
+
+
+class ScreenCapture:
+    """
+    Быстрый снимок экрана для уведомлений.
+    Использует mss (если установлен), иначе PIL.ImageGrab, иначе pyautogui.
+    Снимок уменьшается до max_width и сжимается в JPEG или WebP.
+    """
+
+    FORMATS = {
+        'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+        'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY),
+    }
+
+    def __init__(self, max_width=1280, image_format='jpeg', quality=80):
+        self.logger = logging.getLogger(__name__)
+        self.max_width = max_width
+        self.image_format = image_format if image_format in self.FORMATS else 'jpeg'
+        self.quality = quality
+        self.extension = self.FORMATS[self.image_format][0]
+
+        # mss нельзя использовать из разных потоков - у каждого потока свой экземпляр
+        self._local = threading.local()
+
+        # Библиотека снимка выбирается при первом снимке - не задерживает запуск охраны
+        self.backend = None
+        self._module = None
+        self._backend_lock = threading.Lock()
+
+        # Время последнего снимка по этапам (мс)
+        self.last_timings = {}
+
+    def _select_backend(self):
+        """Импортирует первую доступную библиотеку снимка: mss, PIL.ImageGrab или pyautogui"""
+        with self._backend_lock:
+            if self.backend is not None:
+                return
+            try:
+                import mss
+                self._module, self.backend = mss, 'mss'
+            except ImportError:
+                try:
+                    from PIL import ImageGrab
+                    self._module, self.backend = ImageGrab, 'pillow'
+                except ImportError:
+                    import pyautogui
+                    self._module, self.backend = pyautogui, 'pyautogui'
+            self.logger.info(f"🖥️ Снимок экрана: {self.backend}, {self.image_format} q={self.quality}, до {self.max_width}px")
+
+    def _grab(self):
+        """Снимок всех мониторов в формате BGR"""
+        if self.backend is None:
+            self._select_backend()
+
+        if self.backend == 'mss':
+            if not hasattr(self._local, 'sct'):
+                self._local.sct = self._module.mss()
+            # monitors[0] - общий прямоугольник всех мониторов
+            shot = self._local.sct.grab(self._local.sct.monitors[0])
+            return cv2.cvtColor(np.asarray(shot), cv2.COLOR_BGRA2BGR)
+
+        if self.backend == 'pillow':
+            shot = self._module.grab(all_screens=True)
+        else:
+            shot = self._module.screenshot()
+        return cv2.cvtColor(np.asarray(shot), cv2.COLOR_RGB2BGR)
+
+    def capture(self):
+        """
+        Делает снимок экрана, уменьшает и сжимает его
+        Возвращает bytes изображения (расширение в self.extension)
+        """
+        start = time.perf_counter()
+        image = self._grab()
+        grabbed = time.perf_counter()
+
+        h, w = image.shape[:2]
+        if w > self.max_width:
+            scale = self.max_width / w
+            image = cv2.resize(image, (self.max_width, int(h * scale)), interpolation=cv2.INTER_AREA)
+        resized = time.perf_counter()
+
+        ok, buffer = cv2.imencode(self.extension, image, [self.FORMATS[self.image_format][1], self.quality])
+        if not ok:
+            raise RuntimeError(f"Не удалось сжать снимок экрана в {self.image_format}")
+        encoded = time.perf_counter()
+
+        self.last_timings = {
+            'grab_ms': (grabbed - start) * 1000,
+            'resize_ms': (resized - grabbed) * 1000,
+            'encode_ms': (encoded - resized) * 1000,
+            'size_kb': len(buffer) / 1024
+        }
+        return buffer.tobytes()
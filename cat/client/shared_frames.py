@@ -0,0 +1,136 @@
+import logging
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+
+
+class SharedFrameRing:
+    """
+    Кольцо заранее выделенных слотов под кадры в общей памяти.
+    Поток захвата пишет кадр прямо в слот, процессы инференса читают его
+    через view по (имя блока, смещение, форма) - без pickle и копирования кадра.
+
+    Счетчик ссылок слота ведется только в главном процессе:
+    ссылку держит поток захвата (последний кадр), каждый кадр в конвейере
+    и каждая задача пула процессов, читающая кадр из слота.
+    Слот снова выдается на запись, когда все ссылки отпущены.
+    """
+
+    def __init__(self, slots=4, shape=(480, 640, 3)):
+        self.logger = logging.getLogger(__name__)
+        self.slots = max(2, slots)
+        self.shape = tuple(shape)
+        self.slot_size = int(np.prod(self.shape))
+
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slot_size * self.slots)
+        self._frames = [
+            np.ndarray(self.shape, dtype=np.uint8, buffer=self._shm.buf, offset=index * self.slot_size)
+            for index in range(self.slots)
+        ]
+        self._base = self._frames[0].__array_interface__['data'][0]
+
+        self._refcounts = [0] * self.slots
+        self._free = list(range(self.slots))
+        self._condition = threading.Condition()
+        self._closed = False
+
+        # Статистика
+        self.acquire_timeouts = 0  # все слоты заняты - кадр пропущен (обратное давление)
+
+        self.logger.info(f"🧱 Кольцо кадров в общей памяти: {self.slots} слотов {self.shape}, "
+                         f"{self.slot_size * self.slots / (1024 * 1024):.1f} МБ")
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def acquire(self, timeout=None):
+        """
+        Берет свободный слот на запись (со ссылкой 1)
+        Возвращает (slot, view) или None если свободного слота нет за timeout секунд
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._free or self._closed, timeout):
+                self.acquire_timeouts += 1
+                return None
+            if self._closed:
+                return None
+            slot = self._free.pop()
+            self._refcounts[slot] = 1
+            return slot, self._frames[slot]
+
+    def retain(self, slot):
+        """Добавляет ссылку на слот"""
+        with self._condition:
+            self._refcounts[slot] += 1
+
+    def release(self, slot):
+        """Отпускает ссылку на слот; слот без ссылок возвращается в кольцо"""
+        with self._condition:
+            self._refcounts[slot] -= 1
+            if self._refcounts[slot] == 0:
+                self._free.append(slot)
+                self._condition.notify()
+
+    def slot_of(self, frame):
+        """Номер слота, которому принадлежит кадр, или None если кадр не из кольца"""
+        if frame.dtype != np.uint8 or frame.shape != self.shape:
+            return None
+        offset = frame.__array_interface__['data'][0] - self._base
+        if offset < 0 or offset % self.slot_size or offset // self.slot_size >= self.slots:
+            return None
+        return offset // self.slot_size
+
+    def descriptor(self, frame):
+        """
+        Описание кадра для процесса-воркера: (имя блока, смещение, форма)
+        None если кадр не из кольца - тогда его нужно передавать целиком
+        """
+        slot = self.slot_of(frame)
+        if slot is None:
+            return None
+        return self._shm.name, slot * self.slot_size, self.shape
+
+    def free_slots(self):
+        with self._condition:
+            return len(self._free)
+
+    def get_stats(self):
+        return {
+            'slots': self.slots,
+            'free': self.free_slots(),
+            'acquire_timeouts': self.acquire_timeouts
+        }
+
+    def close(self):
+        """Освобождает общую память (после остановки захвата и пула процессов)"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+
+        self._frames = []
+        try:
+            self._shm.close()
+        except BufferError:
+            # Где-то еще жив view на слот - память освободится вместе с процессом
+            self.logger.debug("Кольцо кадров закрыто при живых ссылках на слоты")
+        self._shm.unlink()
+
+
+# Блоки общей памяти, открытые в процессе-воркере: имя -> SharedMemory
+_attached = {}
+
+
+def attach_frame(descriptor):
+    """
+    В процессе-воркере: view на кадр из кольца по описанию (имя, смещение, форма)
+    Блок открывается один раз и остается открытым до конца процесса
+    """
+    name, offset, shape = descriptor
+    shm = _attached.get(name)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = shm
+    return np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
@@ -0,0 +1,102 @@
+import re
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from .metrics import PipelineMetrics
+
+
+class StartupProfiler:
+    """
+    Замер этапов запуска охраны: от старта процесса до первого проанализированного кадра.
+    Этапы могут идти параллельно (открытие камер, загрузка моделей в пуле),
+    поэтому для каждого хранится начало и длительность относительно старта процесса.
+    Отчет пишется в лог один раз - после первого кадра, и остается в метриках
+    """
+
+    def __init__(self, origin=None):
+        self.logger = logging.getLogger(__name__)
+        # perf_counter() в начале main.py; по умолчанию - момент создания
+        self.origin = origin if origin is not None else time.perf_counter()
+        self._lock = threading.Lock()
+        self._phases = []
+        self._marks = {}
+
+    def elapsed(self):
+        """Секунд с начала запуска"""
+        return time.perf_counter() - self.origin
+
+    @contextmanager
+    def phase(self, name, **labels):
+        """Замеряет этап: with startup.phase('camera_open', camera='cam0'): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, **labels)
+
+    def record(self, name, start, end=None, **labels):
+        """
+        Добавляет этап, замеренный вызывающим кодом (start, end - perf_counter())
+        labels - метки этапа в метриках (например камера)
+        """
+        end = end if end is not None else time.perf_counter()
+        with self._lock:
+            self._phases.append((name, labels, start - self.origin, end - start))
+
+    def mark(self, name):
+        """
+        Отмечает событие (только первое) - например первый кадр
+        Возвращает True если событие отмечено впервые
+        """
+        with self._lock:
+            if name in self._marks:
+                return False
+            self._marks[name] = self.elapsed()
+            return True
+
+    def get_marks(self):
+        with self._lock:
+            return dict(self._marks)
+
+    def report(self):
+        """Строки отчета: этапы по времени начала (+начало, длительность, имя)"""
+        with self._lock:
+            phases = sorted(self._phases, key=lambda phase: phase[2])
+            marks = sorted(self._marks.items(), key=lambda mark: mark[1])
+
+        lines = [f"   +{start:6.3f} сек  {duration:6.3f} сек  {self._title(name, labels)}"
+                 for name, labels, start, duration in phases]
+        lines += [f"   +{at:6.3f} сек  {'':>10}  ● {name}" for name, at in marks]
+        return lines
+
+    def log_report(self, title="Запуск"):
+        """Пишет отчет в лог"""
+        marks = self.get_marks()
+        first_frame = marks.get('first_frame')
+        summary = f"первый кадр проанализирован через {first_frame:.2f} сек" if first_frame is not None \
+            else f"{self.elapsed():.2f} сек"
+        self.logger.info(f"⏱️ {title}: {summary}\n" + "\n".join(self.report()))
+
+    def as_metrics(self):
+        """Длительности этапов и моменты событий для PipelineMetrics (gauges)"""
+        with self._lock:
+            phases = list(self._phases)
+            marks = dict(self._marks)
+
+        values = {}
+        for name, labels, start, duration in phases:
+            key = PipelineMetrics.labeled(f"startup_{self._metric_name(name)}_seconds", **labels)
+            values[key] = max(values.get(key, 0.0), duration)
+        for name, at in marks.items():
+            values[f"startup_{self._metric_name(name)}_at_seconds"] = at
+        return values
+
+    @staticmethod
+    def _title(name, labels):
+        return f"{name} ({', '.join(str(value) for value in labels.values())})" if labels else name
+
+    @staticmethod
+    def _metric_name(name):
+        return re.sub(r'[^a-zA-Z0-9_]', '_', name)
@@ -15,6 +15,50 @@ class ConfigLoader:
             'detection_threshold': '20',
             'alert_time_window': '60', 
             'camera_index': '0',
+            'camera_sources': '',
+            'inference_workers': '0',
+            'inference_mode': 'thread',
+            'shared_frames_enabled': 'true',
+            'motion_gate_enabled': 'true',
+            'motion_threshold': '0.01',
+            'motion_keepalive_interval': '10',
+            'scheduler_alert_interval': '0.1',
+            'scheduler_watch_interval': '0.25',
+            'scheduler_idle_interval': '0.5',
+            'scheduler_idle_max_interval': '2.0',
+            'scheduler_idle_backoff': '1.5',
+            'scheduler_hold_time': '5',
+            'recognition_reverify_interval': '5',
+            'stranger_reverify_interval': '0.5',
+            'tracker_iou_threshold': '0.3',
+            'detection_scale': '1.0',
+            'detector_backend': 'mediapipe_short',
+            'detector_confidence': '0.5',
+            'yunet_model_path': 'models/face_detection_yunet_2023mar.onnx',
+            'recognizer_backend': 'lbph',
+            'recognizer_distance_threshold': '0.6',
+            'ann_index_enabled': 'false',
+            'ann_nprobe': '8',
+            'model_reload_enabled': 'true',
+            'model_reload_interval': '2',
+            'model_reload_debounce': '1',
+            'alert_spool_enabled': 'true',
+            'alert_spool_max_alerts': '100',
+            'alert_spool_max_mb': '50',
+            'alert_spool_max_attempts': '20',
+            'screenshot_max_width': '1280',
+            'screenshot_format': 'jpeg',
+            'screenshot_quality': '80',
+            'evidence_retention': 'false',
+            'evidence_buffer_size': '15',
+            'evidence_photos': '3',
+            'alert_extra_windows': '',
+            'alert_rearm_ratio': '0.5',
+            'alert_cooldown': '60',
+            'alert_count_interval': '0.5',
+            'metrics_enabled': 'true',
+            'metrics_file': 'metrics.prom',
+            'metrics_interval': '15',
             'log_level': 'INFO'
         }
         
@@ -75,6 +119,13 @@ class ConfigLoader:
         except (ValueError, TypeError):
             return default
     
+    def get_float(self, key, default=0.0):
+        """Получает дробное значение"""
+        try:
+            return float(self.settings.get(key, default))
+        except (ValueError, TypeError):
+            return default
+    
     def update_setting(self, key, value):
         """Обновляет настройку в файле"""
         try:
@@ -3,6 +3,10 @@
 Главный файл системы охраны компьютера
 """
 
+import time
+# Начало отсчета для отчета о запуске (время до первого проанализированного кадра)
+STARTED_AT = time.perf_counter()
+
 import sys
 import logging
 from pathlib import Path
@@ -33,6 +37,12 @@ def main():
     print("🛡️ COMPUTER GUARD SYSTEM")
     print("=" * 50)
     
+    # Тяжелые модули (OpenCV, MediaPipe, requests) загружаются позже и по необходимости,
+    # этапы запуска замеряются и пишутся в лог после первого кадра
+    from client.startup_profiler import StartupProfiler
+    startup = StartupProfiler(origin=STARTED_AT)
+    startup.mark('config_loaded')
+    
     # Проверяем конфигурацию
     if config:
         terminal_visible = config.get_bool('terminal_visible', True)
@@ -48,7 +58,8 @@ def main():
         terminal_visible = True
     
     # Проверяем, обучена ли модель
-    if not Path("known_faces_db/face_model.yml").exists():
+    from client.lbph_store import LBPHStore
+    if not (LBPHStore.exists("known_faces_db") or Path("known_faces_db/face_model.yml").exists()):
         print("❌ Модель не обучена!")
         print("💡 Сначала обучите систему:")
         print("   python scripts/face_trainer.py")
@@ -56,10 +67,12 @@ def main():
     
     # Запускаем систему охраны
     try:
-        from client.computer_guard import ComputerGuard
+        with startup.phase('imports'):
+            from client.computer_guard import ComputerGuard
         
         # Передаем настройки в охранную систему
-        guard = ComputerGuard(config=config)
+        with startup.phase('guard_init'):
+            guard = ComputerGuard(config=config, startup=startup)
         
         print("\n🚀 Запуск системы охраны...")
         print("💡 Нажмите Ctrl+C для остановки")
@@ -81,4 +94,7 @@ def main():
         input("\n🎯 Нажмите Enter для выхода...")
 
 if __name__ == "__main__":
+    # Нужно для пула процессов инференса в собранном exe (cx_Freeze)
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
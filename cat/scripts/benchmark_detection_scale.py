@@ -0,0 +1,99 @@
+"""
+Бенчмарк масштаба детекции: скорость и полнота детектора лиц
+на уменьшенных копиях кадра.
+
+Полнота считается относительно детекций на полном разрешении (масштаб 1.0):
+лицо считается найденным, если на уменьшенном кадре есть бокс с IoU >= 0.5.
+
+Пример:
+    python scripts/benchmark_detection_scale.py recordings/office.mp4 --scales 1.0,0.75,0.5,0.35
+"""
+
+import sys
+import time
+import argparse
+import logging
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from client.face_detector import FaceDetector
+from client.face_tracker import box_iou
+from scripts.replay_frames import load_frames
+
+
+def match_count(reference_boxes, boxes, iou_threshold=0.5):
+    """Сколько эталонных боксов найдено среди boxes"""
+    found = 0
+    unused = list(boxes)
+    for ref in reference_boxes:
+        best = max(unused, key=lambda box: box_iou(ref, box), default=None)
+        if best is not None and box_iou(ref, best) >= iou_threshold:
+            unused.remove(best)
+            found += 1
+    return found
+
+
+def run_detector(detector, frames):
+    """Прогоняет детектор по всем кадрам. Возвращает (боксы по кадрам, время по кадрам)"""
+    # Прогрев (первый вызов заметно медленнее)
+    detector.detect_faces(frames[0])
+
+    all_boxes = []
+    timings = []
+    for frame in frames:
+        start = time.perf_counter()
+        all_boxes.append(detector.detect_faces(frame))
+        timings.append(time.perf_counter() - start)
+    return all_boxes, timings
+
+
+def timing_summary(timings):
+    """fps и задержки p50/p95 (мс) по времени кадров"""
+    timings = sorted(timings)
+    fps = len(timings) / sum(timings)
+    p50 = timings[len(timings) // 2] * 1000
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000
+    return fps, p50, p95
+
+
+def main():
+    """Главная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description="Бенчмарк масштаба детекции лиц")
+    parser.add_argument("source", help="Видеофайл или папка с изображениями")
+    parser.add_argument("--scales", default="1.0,0.75,0.5,0.35,0.25", help="Масштабы через запятую")
+    parser.add_argument("--max-frames", type=int, default=300, help="Максимум кадров")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    frames = load_frames(args.source, args.max_frames)
+    if not frames:
+        print("❌ Не найдено ни одного кадра")
+        return
+
+    scales = sorted({float(s) for s in args.scales.split(',')} | {1.0}, reverse=True)
+    print(f"🎞️ Кадров: {len(frames)}, разрешение: {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    reference = None
+    print(f"\n{'масштаб':>8} {'fps':>8} {'p50 мс':>8} {'p95 мс':>8} {'лиц':>6} {'полнота':>8}")
+    for scale in scales:
+        boxes, timings = run_detector(FaceDetector(detection_scale=scale), frames)
+        if reference is None:
+            reference = boxes
+
+        total_ref = sum(len(b) for b in reference)
+        found = sum(match_count(ref, got) for ref, got in zip(reference, boxes))
+        recall = found / total_ref if total_ref else 1.0
+
+        fps, p50, p95 = timing_summary(timings)
+        faces = sum(len(b) for b in boxes)
+
+        print(f"{scale:>8.2f} {fps:>8.1f} {p50:>8.1f} {p95:>8.1f} {faces:>6} {recall:>8.1%}")
+
+    print("\n💡 Выберите наименьший масштаб с приемлемой полнотой и укажите его в config.txt:")
+    print("   detection_scale=<масштаб>")
+
+
+if __name__ == "__main__":
+    main()
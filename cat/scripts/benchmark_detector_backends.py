@@ -0,0 +1,86 @@
+"""
+Сравнение бэкендов детектора лиц: скорость и полнота на записанных кадрах
+(те же входы, что у replay_benchmark.py - видеофайл или папка с изображениями).
+
+Разметки нет, поэтому полнота считается относительно эталонного бэкенда
+(по умолчанию mediapipe_full): лицо найдено, если есть бокс с IoU >= 0.5.
+"Лишние" - боксы, которых нет у эталона (ложные срабатывания или лица, пропущенные эталоном).
+
+Пример:
+    python scripts/benchmark_detector_backends.py recordings/office.mp4
+    python scripts/benchmark_detector_backends.py face_dataset/ --backends haar,yunet --scale 0.5
+"""
+
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from client.face_detector import FaceDetector
+from client.detector_backends import BACKENDS, DEFAULT_YUNET_MODEL
+from scripts.replay_frames import load_frames
+from scripts.benchmark_detection_scale import match_count, run_detector, timing_summary
+
+
+def create_backend(backend, scale, model_path):
+    """Детектор с заданным бэкендом"""
+    detector = FaceDetector(detection_scale=scale, backend=backend, model_path=model_path)
+    # Бэкенд не создался и детектор откатился на бэкенд по умолчанию - сравнивать нечего
+    if detector.backend.name != backend:
+        raise RuntimeError("ошибка создания, см. лог выше")
+    return detector
+
+
+def main():
+    """Главная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description="Сравнение бэкендов детектора лиц")
+    parser.add_argument("source", help="Видеофайл или папка с изображениями")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Бэкенды через запятую")
+    parser.add_argument("--reference", default="mediapipe_full", help="Эталонный бэкенд для полноты")
+    parser.add_argument("--scale", type=float, default=1.0, help="Масштаб детекции (detection_scale)")
+    parser.add_argument("--yunet-model", default=DEFAULT_YUNET_MODEL, help="Файл модели YuNet (.onnx)")
+    parser.add_argument("--max-frames", type=int, default=300, help="Максимум кадров")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    frames = load_frames(args.source, args.max_frames)
+    if not frames:
+        print("❌ Не найдено ни одного кадра")
+        return
+
+    backends = [args.reference] + [b for b in args.backends.split(',') if b and b != args.reference]
+    print(f"🎞️ Кадров: {len(frames)}, разрешение: {frames[0].shape[1]}x{frames[0].shape[0]}, "
+          f"масштаб: {args.scale}, эталон: {args.reference}")
+
+    reference = None
+    print(f"\n{'бэкенд':<16} {'fps':>8} {'p50 мс':>8} {'p95 мс':>8} {'лиц':>6} {'полнота':>8} {'лишние':>7}")
+    for backend in backends:
+        try:
+            boxes, timings = run_detector(create_backend(backend, args.scale, args.yunet_model), frames)
+        except Exception as e:
+            print(f"{backend:<16} ⚠️ недоступен: {e}")
+            if reference is None:
+                print("❌ Эталонный бэкенд недоступен - полноту посчитать нельзя")
+                return
+            continue
+
+        if reference is None:
+            reference = boxes
+
+        total_ref = sum(len(b) for b in reference)
+        found = sum(match_count(ref, got) for ref, got in zip(reference, boxes))
+        recall = found / total_ref if total_ref else 1.0
+        faces = sum(len(b) for b in boxes)
+        fps, p50, p95 = timing_summary(timings)
+
+        print(f"{backend:<16} {fps:>8.1f} {p50:>8.1f} {p95:>8.1f} {faces:>6} {recall:>8.1%} {faces - found:>7}")
+
+    print("\n💡 Выберите самый быстрый бэкенд с приемлемой полнотой и укажите его в config.txt:")
+    print("   detector_backend=<бэкенд>")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Подбор ann_nprobe: полнота и скорость индекса галереи (IVF) против полного перебора.
+
+Запросы - образцы галереи с небольшим шумом (как новые кадры известных людей).
+Полнота - доля запросов, для которых индекс вернул того же человека, что и полный перебор.
+
+Примеры:
+    python scripts/benchmark_gallery_index.py                         # галерея из known_faces_db/
+    python scripts/benchmark_gallery_index.py --synthetic 500x20      # 500 человек по 20 образцов
+"""
+
+import sys
+import time
+import argparse
+import logging
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from client.embedding_gallery import EmbeddingGallery, EMBEDDING_SIZE
+from client.gallery_index import GalleryIndex
+
+
+def synthetic_gallery(people, samples, seed=0):
+    """Галерея из people кластеров по samples образцов (разброс как у эмбеддингов dlib)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=0.06, size=(people, EMBEDDING_SIZE)).astype(np.float32)
+    labels = np.repeat(np.arange(people, dtype=np.int32), samples)
+    embeddings = centers[labels] + rng.normal(scale=0.025, size=(len(labels), EMBEDDING_SIZE)).astype(np.float32)
+    return embeddings, labels
+
+
+def time_queries(match, queries, batch):
+    """Метки по всем запросам и время на пакет (как лица одного кадра), сек"""
+    labels = []
+    timings = []
+    for start in range(0, len(queries), batch):
+        begin = time.perf_counter()
+        labels.append(match(queries[start:start + batch])[0])
+        timings.append(time.perf_counter() - begin)
+    return np.concatenate(labels), sorted(timings)
+
+
+def main():
+    """Главная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description="Полнота и скорость индекса галереи эмбеддингов")
+    parser.add_argument("--db", default="known_faces_db", help="Папка с галереей (embeddings*.npy)")
+    parser.add_argument("--synthetic", help="Синтетическая галерея ЛЮДИxОБРАЗЦЫ, например 500x20")
+    parser.add_argument("--nlist", type=int, default=None, help="Число списков (по умолчанию ~sqrt(N))")
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32", help="Значения nprobe через запятую")
+    parser.add_argument("--queries", type=int, default=1000, help="Число запросов")
+    parser.add_argument("--batch", type=int, default=2, help="Лиц в одном запросе (на кадре)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.synthetic:
+        people, samples = (int(value) for value in args.synthetic.lower().split('x'))
+        embeddings, labels = synthetic_gallery(people, samples)
+    else:
+        gallery = EmbeddingGallery()
+        if not gallery.load(args.db):
+            return
+        embeddings, labels = gallery.embeddings, gallery.labels
+
+    exact = EmbeddingGallery()
+    exact.set(embeddings, labels)
+
+    start = time.perf_counter()
+    index = GalleryIndex.build(embeddings, labels, nlist=args.nlist)
+    build_time = time.perf_counter() - start
+
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(embeddings), args.queries)
+    queries = embeddings[picks] + rng.normal(scale=0.02, size=(args.queries, EMBEDDING_SIZE)).astype(np.float32)
+
+    print(f"🧬 Галерея: {len(embeddings)} образцов, {len(np.unique(labels))} человек")
+    print(f"🗂️ Индекс: {index.nlist} списков, построен за {build_time:.2f} сек")
+
+    reference, timings = time_queries(exact.match, queries, args.batch)
+    print(f"\n{'поиск':<12} {'p50 мкс':>9} {'p95 мкс':>9} {'полнота':>8}")
+    print(f"{'перебор':<12} {timings[len(timings) // 2] * 1e6:>9.0f} "
+          f"{timings[int(len(timings) * 0.95)] * 1e6:>9.0f} {1:>8.1%}")
+
+    for nprobe in sorted(int(value) for value in args.nprobe.split(',')):
+        index.nprobe = nprobe
+        found, timings = time_queries(index.search, queries, args.batch)
+        recall = np.mean(found == reference)
+        print(f"{'nprobe=' + str(nprobe):<12} {timings[len(timings) // 2] * 1e6:>9.0f} "
+              f"{timings[int(len(timings) * 0.95)] * 1e6:>9.0f} {recall:>8.1%}")
+
+    print("\n💡 Выберите наименьший nprobe с приемлемой полнотой и укажите его в config.txt:")
+    print("   ann_index_enabled=true")
+    print("   ann_nprobe=<значение>")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,186 @@
 import cv2
 import os
+import sys
+import time
+import hashlib
 import logging
+import argparse
 import numpy as np
 from pathlib import Path
 import json
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from client.embedding_gallery import (
+    EmbeddingGallery, compute_embeddings, EMBEDDING_SIZE
+)
+from client.gallery_index import GalleryIndex
+from client.lbph_store import LBPHStore, lbp_histogram, HISTOGRAM_SIZE
+from client.model_files import save_json
+
+MANIFEST_FILE = "manifest.json"
+FACE_SIZE = (100, 100)
+LOAD_STAGES = ('read', 'decode', 'preprocess', 'locate', 'embed')
+
+
+def file_digest(path):
+    """SHA-1 содержимого файла"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_sample(path, build_embedding=False):
+    """
+    Загружает и готовит одно изображение датасета (выполняется и в процессах пула)
+    Возвращает (лицо 100x100 в grayscale или None, эмбеддинг или None, время этапов в сек, ошибка или None).
+    Эмбеддинг - None, если на изображении не ровно одно лицо
+    """
+    timings = dict.fromkeys(LOAD_STAGES, 0.0)
+    try:
+        return _load_sample(path, build_embedding, timings) + (timings, None)
+    except Exception as e:
+        return None, None, timings, str(e)
+
+
+def _load_sample(path, build_embedding, timings):
+    start = time.perf_counter()
+    data = np.fromfile(path, dtype=np.uint8)
+    read = time.perf_counter()
+    image = cv2.imdecode(data, cv2.IMREAD_COLOR) if data.size else None
+    decoded = time.perf_counter()
+    timings['read'] = read - start
+    timings['decode'] = decoded - read
+    
+    if image is None:
+        return None, None
+    
+    # Grayscale и стандартный размер
+    gray = cv2.resize(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), FACE_SIZE)
+    preprocessed = time.perf_counter()
+    timings['preprocess'] = preprocessed - decoded
+    
+    embedding = None
+    if build_embedding:
+        # В датасете - портреты, а не вырезанные лица: эмбеддинг считается по боксу
+        # найденного лица, как при распознавании. Снимок с несколькими лицами
+        # или без лица в галерею не попадает
+        import face_recognition
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        locations = face_recognition.face_locations(rgb)
+        located = time.perf_counter()
+        timings['locate'] = located - preprocessed
+        if len(locations) == 1:
+            top, right, bottom, left = locations[0]
+            embedding = compute_embeddings(rgb, [(left, top, right - left, bottom - top)])[0]
+            timings['embed'] = time.perf_counter() - located
+    
+    return gray, embedding
+
 
 class FaceTrainer:
-    """Обучает систему на датасете известных лиц используя OpenCV LBPH"""
+    """
+    Обучает систему на датасете известных лиц (LBPH).
+    Модель сохраняется в бинарном виде (LBPHStore): гистограммы LBP всех образцов
+    в .npy - загрузка охраны не зависит от размера датасета
+    """
     
-    def __init__(self):
+    # Меньше изображений грузим в текущем процессе - запуск пула дороже
+    MIN_PARALLEL_IMAGES = 16
+    
+    def __init__(self, build_embeddings=True, db_path="known_faces_db", workers=0, write_yaml=False):
         self.logger = logging.getLogger(__name__)
-        self.recognizer = cv2.face.LBPHFaceRecognizer_create()
+        # Текстовая модель OpenCV face_model.yml - только для совместимости со старыми версиями
+        self.write_yaml = write_yaml
+        self.recognizer = cv2.face.LBPHFaceRecognizer_create() if write_yaml else None
+        self.db_path = Path(db_path)
+        # Процессов для загрузки изображений (0 - по числу ядер, 1 - без пула)
+        self.workers = workers or os.cpu_count() or 1
+        # Галерея эмбеддингов для recognizer_backend=embedding (нужен face_recognition)
+        self.build_embeddings = build_embeddings and self._embeddings_available()
+    
+    def _embeddings_available(self):
+        try:
+            import face_recognition
+            return True
+        except ImportError:
+            self.logger.warning("⚠️ face_recognition не установлен - галерея эмбеддингов не строится")
+            return False
+    
+    @staticmethod
+    def _list_images(person_dir):
+        return list(person_dir.glob("*.jpg")) + list(person_dir.glob("*.png")) + list(person_dir.glob("*.jpeg"))
+    
+    def _load_samples(self, img_paths):
+        """
+        Загружает изображения параллельно в пуле процессов.
+        Лица складываются в один заранее выделенный массив uint8 (N, 100, 100)
+        по мере готовности, эмбеддинги - в массив float32 (N, 128).
+        Возвращает (лица, флаги успешной загрузки, эмбеддинги или None, флаги наличия эмбеддинга)
+        """
+        count = len(img_paths)
+        faces = np.empty((count, FACE_SIZE[1], FACE_SIZE[0]), dtype=np.uint8)
+        embeddings = np.empty((count, EMBEDDING_SIZE), dtype=np.float32) if self.build_embeddings else None
+        loaded = np.zeros(count, dtype=bool)
+        embedded = np.zeros(count, dtype=bool)
+        stage_totals = dict.fromkeys(LOAD_STAGES, 0.0)
+        
+        start = time.perf_counter()
+        workers = min(self.workers, count) if count >= self.MIN_PARALLEL_IMAGES else 1
+        paths = [str(path) for path in img_paths]
+        flags = [self.build_embeddings] * count
+        
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(load_sample, paths, flags, chunksize=max(1, count // (workers * 8)))
+        else:
+            executor = None
+            results = map(load_sample, paths, flags)
+        
+        try:
+            for index, (gray, embedding, timings, error) in enumerate(results):
+                for stage, value in timings.items():
+                    stage_totals[stage] += value
+                if error is not None:
+                    self.logger.error(f"  ❌ Ошибка обработки {img_paths[index]}: {error}")
+                    continue
+                if gray is None:
+                    self.logger.warning(f"  ⚠️ Не удалось загрузить: {img_paths[index].name}")
+                    continue
+                faces[index] = gray
+                loaded[index] = True
+                if embeddings is None:
+                    continue
+                if embedding is None:
+                    self.logger.warning(f"  ⚠️ {img_paths[index].name}: нужно ровно одно лицо - "
+                                        f"в галерею эмбеддингов не добавлено")
+                    continue
+                embeddings[index] = embedding
+                embedded[index] = True
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        
+        elapsed = time.perf_counter() - start
+        stages = ", ".join(f"{stage} {value:.2f}" for stage, value in stage_totals.items() if value)
+        self.logger.info(f"⏱️ Загрузка: {int(loaded.sum())}/{count} изображений за {elapsed:.2f} сек "
+                         f"({count / elapsed if elapsed > 0 else 0:.0f} изобр/сек, процессов: {workers}); "
+                         f"сумма по этапам, сек: {stages}")
+        return faces, loaded, embeddings, embedded
+    
+    @staticmethod
+    def _manifest_entry(img_path, label, digest=None):
+        """Запись манифеста: хэш содержимого, размер и время изменения (для быстрой проверки)"""
+        stat = img_path.stat()
+        return {
+            'sha1': digest or file_digest(img_path),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'label': label
+        }
     
     def train_from_dataset(self, dataset_path="face_dataset"):
         """
@@ -23,113 +193,282 @@ class FaceTrainer:
             self.logger.error(f"❌ Папка с датасетом не найдена: {dataset_path}")
             return False
         
-        faces = []
-        labels = []
-        label_map = {}
+        manifest = {}
         current_label = 0
         known_face_names = []
         
         self.logger.info("🎯 Начинаем обучение на датасете...")
         
+        # Сначала собираем список файлов, затем грузим все изображения параллельно
+        persons = [(person_dir.name, self._list_images(person_dir))
+                   for person_dir in dataset_path.iterdir() if person_dir.is_dir()]
+        img_paths = [img_path for _, images in persons for img_path in images]
+        faces, loaded, embeddings, embedded = self._load_samples(img_paths)
+        labels = np.full(len(img_paths), -1, dtype=np.int32)
+        
         # Проходим по всем персонажам в датасете
-        for person_dir in dataset_path.iterdir():
-            if not person_dir.is_dir():
-                continue
-                
-            person_name = person_dir.name
+        position = 0
+        for person_name, images in persons:
             self.logger.info(f"👤 Обрабатываем: {person_name}")
             
-            # Назначаем метку для этого человека
-            label_map[current_label] = person_name
-            known_face_names.append(person_name)
-            
             image_count = 0
-            
-            # ИСПРАВЛЕНИЕ: Правильно объединяем генераторы
-            image_files = list(person_dir.glob("*.jpg")) + list(person_dir.glob("*.png")) + list(person_dir.glob("*.jpeg"))
-            
-            for img_path in image_files:
-                try:
-                    # Загружаем изображение
-                    image = cv2.imread(str(img_path))
-                    
-                    if image is None:
-                        self.logger.warning(f"  ⚠️ Не удалось загрузить: {img_path.name}")
-                        continue
-                    
-                    # Конвертируем в grayscale
-                    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-                    
-                    # Изменяем размер для стандартизации
-                    gray = cv2.resize(gray, (100, 100))
-                    
-                    # Добавляем в данные для обучения
-                    faces.append(gray)
-                    labels.append(current_label)
-                    image_count += 1
-                    
-                    self.logger.debug(f"  ✅ Обработано: {img_path.name}")
-                        
-                except Exception as e:
-                    self.logger.error(f"  ❌ Ошибка обработки {img_path}: {e}")
+            for index in range(position, position + len(images)):
+                if not loaded[index]:
                     continue
+                labels[index] = current_label
+                image_count += 1
+                manifest[f"{person_name}/{img_paths[index].name}"] = self._manifest_entry(img_paths[index], current_label)
+            position += len(images)
             
             self.logger.info(f"  📊 Для {person_name} обработано изображений: {image_count}")
             
             if image_count == 0:
                 self.logger.warning(f"  ⚠️ В папке {person_name} не найдено подходящих изображений!")
             else:
+                # Назначаем метку для этого человека
+                known_face_names.append(person_name)
                 current_label += 1
         
-        if len(faces) == 0:
+        keep = np.flatnonzero(loaded)
+        if len(keep) == 0:
             self.logger.error("❌ Не найдено ни одного лица в датасете!")
             return False
         
-        # Обучаем модель
+        # Обучаем модель: LBPH - это гистограммы LBP всех образцов
         self.logger.info("🧠 Обучаем модель LBPH...")
-        self.recognizer.train(faces, np.array(labels))
+        start = time.perf_counter()
+        histograms = self._histograms(faces, keep)
+        if self.recognizer is not None:
+            # Лица передаются срезами общего массива, без копирования
+            self.recognizer.train([faces[index] for index in keep], labels[keep])
+        self.logger.info(f"⏱️ Обучение LBPH: {time.perf_counter() - start:.2f} сек")
+        
+        embedding_labels = None
+        if embeddings is not None:
+            embedded = np.flatnonzero(loaded & embedded)
+            embeddings, embedding_labels = embeddings[embedded], labels[embedded]
+        
+        start = time.perf_counter()
+        self._save(known_face_names, len(keep), histograms, labels[keep], embeddings, embedding_labels, manifest)
+        self.logger.info(f"⏱️ Сохранение модели: {time.perf_counter() - start:.2f} сек")
+        
+        self.logger.info(f"✅ Обучение завершено успешно!")
+        self.logger.info(f"📊 Всего образцов: {len(keep)}")
+        self.logger.info(f"👥 Уникальных персонажей: {len(known_face_names)}")
+        
+        return True
+    
+    def train_incremental(self, dataset_path="face_dataset"):
+        """
+        Дообучение только на новых файлах датасета (LBPH update вместо обучения с нуля).
+        Неизмененные файлы пропускаются по манифесту: сначала сверяются размер и время
+        изменения, хэш содержимого считается только если они отличаются.
+        Удаленные или измененные файлы нельзя убрать из модели - тогда выполняется
+        полное обучение. Возвращает True если модель актуальна
+        """
+        start = time.perf_counter()
+        dataset_path = Path(dataset_path)
+        
+        if not dataset_path.exists():
+            self.logger.error(f"❌ Папка с датасетом не найдена: {dataset_path}")
+            return False
+        
+        model_path = self.db_path / "face_model.yml"
+        labels_path = self.db_path / "labels.json"
+        manifest_path = self.db_path / MANIFEST_FILE
+        
+        has_model = LBPHStore.exists(self.db_path) and (model_path.exists() or not self.write_yaml)
+        if not (has_model and labels_path.exists() and manifest_path.exists()):
+            self.logger.info("ℹ️ Нет модели или манифеста - выполняем полное обучение")
+            return self.train_from_dataset(dataset_path)
+        if self.build_embeddings and not EmbeddingGallery.exists(self.db_path):
+            self.logger.info("ℹ️ Нет галереи эмбеддингов - выполняем полное обучение")
+            return self.train_from_dataset(dataset_path)
+        
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        with open(labels_path, 'r', encoding='utf-8') as f:
+            known_face_names = json.load(f)['names']
+        
+        # Сверяем датасет с манифестом
+        current = {}
+        for person_dir in dataset_path.iterdir():
+            if person_dir.is_dir():
+                for img_path in self._list_images(person_dir):
+                    current[f"{person_dir.name}/{img_path.name}"] = (person_dir.name, img_path)
+        
+        removed = set(manifest) - set(current)
+        if removed:
+            self.logger.info(f"ℹ️ Удалено файлов: {len(removed)} - выполняем полное обучение")
+            return self.train_from_dataset(dataset_path)
+        
+        pending = []
+        for key, (person_name, img_path) in current.items():
+            entry = manifest.get(key)
+            stat = img_path.stat()
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                continue
+            
+            digest = file_digest(img_path)
+            if entry and entry['sha1'] == digest:
+                # Файл перезаписан тем же содержимым
+                entry.update(size=stat.st_size, mtime=stat.st_mtime)
+                continue
+            if entry:
+                self.logger.info(f"ℹ️ Изменен файл {key} - выполняем полное обучение")
+                return self.train_from_dataset(dataset_path)
+            pending.append((key, person_name, img_path, digest))
+        
+        if not pending:
+            self._write_json(manifest_path, manifest)
+            self.logger.info(f"✅ Новых изображений нет, модель актуальна ({(time.perf_counter() - start) * 1000:.0f} мс)")
+            return True
+        
+        faces, loaded, embeddings, embedded = self._load_samples([img_path for _, _, img_path, _ in pending])
+        labels = np.full(len(pending), -1, dtype=np.int32)
+        for index, (key, person_name, img_path, digest) in enumerate(pending):
+            if not loaded[index]:
+                continue
+            
+            # Новый человек получает следующую метку
+            if person_name not in known_face_names:
+                known_face_names.append(person_name)
+                self.logger.info(f"👤 Новый человек: {person_name}")
+            labels[index] = known_face_names.index(person_name)
+            manifest[key] = self._manifest_entry(img_path, int(labels[index]), digest)
+            self.logger.debug(f"  ✅ Добавлено: {key}")
+        
+        keep = np.flatnonzero(loaded)
+        if len(keep) == 0:
+            self.logger.warning("⚠️ Новые файлы не удалось загрузить, модель не изменена")
+            return True
         
-        # Сохраняем модель и метки
-        db_path = Path("known_faces_db")
+        # Дообучаем модель: гистограммы новых лиц добавляются к существующим
+        store = LBPHStore.load(self.db_path)
+        histograms = np.concatenate([store.histograms, self._histograms(faces, keep)])
+        histogram_labels = np.concatenate([store.labels, labels[keep]])
+        del store
+        if self.recognizer is not None:
+            self.recognizer.read(str(model_path))
+            self.recognizer.update([faces[index] for index in keep], labels[keep])
+        
+        embedding_labels = None
+        added = None
+        if embeddings is not None:
+            embedded = np.flatnonzero(loaded & embedded)
+            added = (embeddings[embedded], labels[embedded])
+            gallery_embeddings, gallery_labels = EmbeddingGallery.read(self.db_path)
+            embeddings = np.concatenate([gallery_embeddings, added[0]])
+            embedding_labels = np.concatenate([gallery_labels, added[1]])
+        
+        self._save(known_face_names, len(manifest), histograms, histogram_labels,
+                   embeddings, embedding_labels, manifest, added=added)
+        
+        self.logger.info(f"✅ Дообучение завершено: добавлено {len(keep)} изображений "
+                         f"за {(time.perf_counter() - start) * 1000:.0f} мс")
+        return True
+    
+    @staticmethod
+    def _histograms(faces, indices):
+        """Гистограммы LBP лиц faces[indices] - матрица float32 (N, 16384)"""
+        histograms = np.empty((len(indices), HISTOGRAM_SIZE), dtype=np.float32)
+        for row, index in enumerate(indices):
+            histograms[row] = lbp_histogram(faces[index])
+        return histograms
+    
+    @staticmethod
+    def _write_json(path, data):
+        save_json(path, data)
+    
+    def _save(self, known_face_names, total_samples, histograms, histogram_labels,
+              embeddings, embedding_labels, manifest, added=None):
+        """
+        Сохраняет модель, галерею эмбеддингов, метки, метаданные и манифест
+        added - (эмбеддинги, метки), добавленные дообучением к прежней галерее
+        """
+        db_path = self.db_path
         db_path.mkdir(exist_ok=True)
         
-        # Сохраняем модель
-        self.recognizer.save(str(db_path / "face_model.yml"))
+        # Сохраняем модель: бинарные гистограммы, заголовок пишется последним
+        LBPHStore.save(db_path, histograms, histogram_labels)
+        self.logger.info(f"💾 Модель LBPH: {len(histogram_labels)} образцов, "
+                         f"{histograms.nbytes / 1024 / 1024:.1f} МБ")
+        
+        yaml_path = db_path / "face_model.yml"
+        if self.recognizer is not None:
+            self.recognizer.save(str(yaml_path))
+        elif yaml_path.exists():
+            # Устаревшая текстовая модель больше не соответствует датасету
+            yaml_path.unlink()
+        
+        # Сохраняем галерею эмбеддингов: одна матрица float32 (образцы, 128)
+        if self.build_embeddings:
+            EmbeddingGallery.save(db_path, embeddings, embedding_labels)
+            self.logger.info(f"🧬 Галерея эмбеддингов: {len(embeddings)} образцов")
+            
+            # Индекс для приближенного поиска (ann_index_enabled в config.txt)
+            if len(embeddings):
+                self._save_index(embeddings, embedding_labels, added)
         
         # Сохраняем метки
         labels_data = {
             'names': known_face_names,
-            'label_map': label_map,
-            'total_samples': len(faces),
+            'label_map': dict(enumerate(known_face_names)),
+            'total_samples': total_samples,
             'unique_persons': len(known_face_names)
         }
-        
-        with open(db_path / "labels.json", 'w', encoding='utf-8') as f:
-            json.dump(labels_data, f, indent=2, ensure_ascii=False)
+        self._write_json(db_path / "labels.json", labels_data)
         
         # Сохраняем метаданные
         import datetime
         metadata = {
-            'total_faces': len(faces),
+            'total_faces': total_samples,
             'unique_persons': len(known_face_names),
             'trained_at': str(datetime.datetime.now()),
-            'model_used': 'OpenCV_LBPH'
+            'model_used': 'OpenCV_LBPH',
+            'model_format': 'lbph_npy' + ('+yml' if self.recognizer is not None else ''),
+            'embeddings': self.build_embeddings
         }
+        self._write_json(db_path / "metadata.json", metadata)
         
-        with open(db_path / "metadata.json", 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
-        
-        self.logger.info(f"✅ Обучение завершено успешно!")
-        self.logger.info(f"📊 Всего образцов: {len(faces)}")
-        self.logger.info(f"👥 Уникальных персонажей: {len(known_face_names)}")
+        # Манифест файлов датасета для дообучения
+        self._write_json(db_path / MANIFEST_FILE, manifest)
+    
+    def _save_index(self, embeddings, embedding_labels, added=None):
+        """
+        Сохраняет индекс галереи. При дообучении новые векторы добавляются в списки
+        готового индекса; k-means пересчитывается, только если индекса нет,
+        он не соответствует прежней галерее или галерея сильно выросла
+        """
+        index = None
+        if added is not None:
+            index = GalleryIndex.load(self.db_path)
+            previous = len(embeddings) - len(added[0])
+            if index is not None and (len(index) != previous or index.needs_rebuild(len(embeddings))):
+                index = None
+            if index is not None:
+                index = index.extend(*added)
+                self.logger.info(f"🗂️ Индекс галереи дополнен: {len(added[0])} образцов в {index.nlist} списков")
         
-        return True
+        if index is None:
+            index = GalleryIndex.build(np.array(embeddings), embedding_labels)
+            self.logger.info(f"🗂️ Индекс галереи: {index.nlist} списков")
+        index.save(self.db_path)
 
 def main():
     """Главная функция обучения"""
     import logging
     logging.basicConfig(level=logging.INFO)
     
+    parser = argparse.ArgumentParser(description="Обучение системы распознавания лиц")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Дообучить только на новых изображениях (по манифесту known_faces_db/manifest.json)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Процессов для загрузки изображений (0 - по числу ядер)")
+    parser.add_argument("--yaml", action="store_true",
+                        help="Дополнительно сохранить текстовую модель OpenCV face_model.yml (медленная загрузка)")
+    args = parser.parse_args()
+    
     print("🎯 ОБУЧЕНИЕ СИСТЕМЫ РАСПОЗНАВАНИЯ ЛИЦ (OpenCV LBPH)")
     print("=" * 50)
     
@@ -144,7 +483,7 @@ def main():
         print("   pip install opencv-contrib-python")
         return
     
-    trainer = FaceTrainer()
+    trainer = FaceTrainer(workers=args.workers, write_yaml=args.yaml)
     
     # Проверяем наличие датасета
     if not Path("face_dataset").exists():
@@ -176,7 +515,10 @@ def main():
         return
     
     # Запускаем обучение
-    success = trainer.train_from_dataset()
+    if args.incremental:
+        success = trainer.train_incremental()
+    else:
+        success = trainer.train_from_dataset()
     
     if success:
         print("\n✅ ОБУЧЕНИЕ ЗАВЕРШЕНО!")
@@ -0,0 +1,191 @@
+"""
+Бенчмарк конвейера охраны без веб-камеры.
+
+Прогоняет видеофайл или папку с изображениями через ComputerGuard.process_frame
+(фильтр движения, детектор, трекер, распознавание, движок частоты),
+при этом отправка на сервер и скриншоты заменены заглушками.
+Выводит fps, задержки этапов, пиковое потребление памяти и решения об уведомлениях.
+Время конвейера (окна счетчиков, keep-alive фильтра движения, перепроверка треков)
+идет по записи - номер кадра / fps источника, поэтому решения не зависят от скорости машины.
+
+Запуск из папки cat/:
+    python scripts/replay_benchmark.py recordings/office.mp4
+    python scripts/replay_benchmark.py face_dataset/ --json bench.json
+"""
+
+import sys
+import json
+import time
+import resource
+import argparse
+import logging
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config_loader import ConfigLoader
+from scripts.replay_frames import iter_frames, load_frames, source_fps
+
+# fps папки с изображениями, если не задан --fps (темп режима тревоги)
+DEFAULT_FPS = 10.0
+
+
+class ReplayClock:
+    """Время записи: начало прогона + номер текущего кадра / fps"""
+
+    def __init__(self, fps, start=None):
+        self.fps = fps
+        self.start = time.time() if start is None else start
+        self.frame_index = 0
+
+    def __call__(self):
+        return self.start + self.frame_index / self.fps
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """
+    Пиковое потребление памяти процессом (МБ)
+    RUSAGE_CHILDREN - самый большой из завершенных дочерних процессов (процессы инференса)
+    """
+    usage = resource.getrusage(who).ru_maxrss
+    # Linux возвращает КБ, macOS - байты
+    return usage / 1024 if sys.platform != 'darwin' else usage / (1024 * 1024)
+
+
+def create_guard(config_path, overrides, clock=None):
+    """Создает ComputerGuard без сети, скриншотов и записи на диск (clock - время записи)"""
+    from client.computer_guard import ComputerGuard
+
+    config = ConfigLoader(config_path)
+    config.settings.update({
+        'alert_spool_enabled': 'false',
+        'evidence_retention': 'false',
+    })
+    config.settings.update(overrides)
+
+    guard = ComputerGuard(computer_id="REPLAY", config=config, clock=clock)
+    guard.take_screenshot = lambda: None
+    guard.send_api_alert = lambda *args, **kwargs: True
+    # Загрузка моделей в пуле инференса не входит в замер прогона
+    guard.wait_inference_ready()
+    return guard
+
+
+def run_replay(guard, frames, clock=None):
+    """
+    Прогоняет кадры через guard.process_frame; clock (ReplayClock) переводится на каждый кадр
+    Возвращает (затраченное время, список уведомлений)
+    """
+    alerts = []
+    start = time.perf_counter()
+
+    for index, frame in enumerate(frames):
+        if clock is not None:
+            clock.frame_index = index
+        triggered_before = guard.metrics.counters.get('alerts_triggered', 0)
+        guard.process_frame(frame)
+        if guard.metrics.counters.get('alerts_triggered', 0) > triggered_before:
+            alert = {'frame': index, 'detection_count': guard.channels[0].detection_counter}
+            if clock is not None:
+                alert['at_s'] = index / clock.fps
+            alerts.append(alert)
+
+    return time.perf_counter() - start, alerts
+
+
+def build_report(guard, elapsed, alerts):
+    """Собирает отчет по результатам прогона"""
+    snapshot = guard.metrics.snapshot()
+    frames = snapshot['counters'].get('frames_processed', 0)
+    return {
+        'frames': frames,
+        'elapsed_s': elapsed,
+        'fps': frames / elapsed if elapsed > 0 else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        # Процессы инференса (inference_mode=process) учитываются после их остановки;
+        # ru_maxrss дочерних процессов - максимум по процессу, а не сумма
+        'peak_rss_children_mb': peak_rss_mb(resource.RUSAGE_CHILDREN),
+        'stages': {
+            stage: {
+                'p50_ms': quantiles[0.5] * 1000,
+                'p95_ms': quantiles[0.95] * 1000,
+                'p99_ms': quantiles[0.99] * 1000,
+                'count': count
+            }
+            for stage, (quantiles, total, count) in snapshot['stages'].items()
+        },
+        'counters': snapshot['counters'],
+        'recognitions_run': guard.channels[0].recognitions_run,
+        'recognitions_cached': guard.channels[0].recognitions_cached,
+        'motion': guard.channels[0].motion_detector.get_stats(),
+        'alerts': alerts
+    }
+
+
+def print_report(report):
+    """Выводит отчет в консоль"""
+    print(f"\n🎞️ Кадров: {report['frames']} за {report['elapsed_s']:.2f} сек → {report['fps']:.1f} fps")
+    children = f", дочерний процесс (макс.): {report['peak_rss_children_mb']:.0f} МБ" if report['peak_rss_children_mb'] else ""
+    print(f"💾 Пиковая память: {report['peak_rss_mb']:.0f} МБ{children}")
+    print(f"🧠 Распознаваний: {report['recognitions_run']}, из кэша треков: {report['recognitions_cached']}")
+    print(f"🏃 Фильтр движения: {report['motion']}")
+
+    print(f"\n{'этап':<18} {'p50 мс':>8} {'p95 мс':>8} {'p99 мс':>8} {'вызовов':>8}")
+    for stage, stats in sorted(report['stages'].items()):
+        print(f"{stage:<18} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['count']:>8}")
+
+    print(f"\n🚨 Уведомлений: {len(report['alerts'])}")
+    for alert in report['alerts']:
+        at = f" ({alert['at_s']:.1f} сек записи)" if 'at_s' in alert else ""
+        print(f"   кадр {alert['frame']}{at}: {alert['detection_count']} обнаружений")
+
+
+def parse_overrides(items):
+    """Разбирает переопределения настроек вида key=value"""
+    overrides = {}
+    for item in items or []:
+        key, value = item.split('=', 1)
+        overrides[key.strip()] = value.strip()
+    return overrides
+
+
+def main():
+    """Главная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера охраны на записанных кадрах")
+    parser.add_argument("source", help="Видеофайл или папка с изображениями")
+    parser.add_argument("--config", default="config.txt", help="Файл настроек")
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE", help="Переопределить настройку")
+    parser.add_argument("--max-frames", type=int, default=None, help="Максимум кадров")
+    parser.add_argument("--stream", action="store_true",
+                        help="Декодировать кадры на лету (по умолчанию все кадры загружаются заранее)")
+    parser.add_argument("--json", help="Сохранить отчет в JSON (для сравнения прогонов)")
+    parser.add_argument("--fps", type=float, default=None,
+                        help=f"fps записи для времени конвейера (по умолчанию из видео, для папки - {DEFAULT_FPS:g})")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    clock = ReplayClock(args.fps or source_fps(args.source) or DEFAULT_FPS)
+    guard = create_guard(args.config, parse_overrides(args.set), clock=clock)
+
+    frames = iter_frames(args.source, args.max_frames) if args.stream else load_frames(args.source, args.max_frames)
+
+    try:
+        elapsed, alerts = run_replay(guard, frames, clock=clock)
+    finally:
+        guard._alert_executor.shutdown(wait=True)
+        guard._close_inference()
+        guard._close_channels()
+        guard.alert_dispatcher.stop()
+
+    report = build_report(guard, elapsed, alerts)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n📁 Отчет сохранен: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
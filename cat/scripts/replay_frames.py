@@ -0,0 +1,60 @@
+import cv2
+import logging
+from pathlib import Path
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def iter_frames(source, max_frames=None):
+    """
+    Перебирает кадры из видеофайла или папки с изображениями (BGR, как с камеры)
+    Изображения в папке идут в порядке имен файлов
+    """
+    logger = logging.getLogger(__name__)
+    source = Path(source)
+    count = 0
+
+    if source.is_dir():
+        image_files = sorted(p for p in source.rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+        for img_path in image_files:
+            if max_frames is not None and count >= max_frames:
+                return
+            frame = cv2.imread(str(img_path))
+            if frame is None:
+                logger.warning(f"⚠️ Не удалось загрузить: {img_path}")
+                continue
+            count += 1
+            yield frame
+        return
+
+    cap = cv2.VideoCapture(str(source))
+    if not cap.isOpened():
+        raise ValueError(f"Не удалось открыть источник кадров: {source}")
+
+    try:
+        while max_frames is None or count < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            count += 1
+            yield frame
+    finally:
+        cap.release()
+
+
+def source_fps(source):
+    """Частота кадров видеофайла или None (папка с изображениями, fps неизвестен)"""
+    source = Path(source)
+    if source.is_dir():
+        return None
+    cap = cv2.VideoCapture(str(source))
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) if cap.isOpened() else 0
+    finally:
+        cap.release()
+    return fps if fps and fps > 0 else None
+
+
+def load_frames(source, max_frames=300):
+    """Загружает кадры в память, чтобы декодирование не влияло на замеры"""
+    return list(iter_frames(source, max_frames))